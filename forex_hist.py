@@ -8,7 +8,17 @@ Tkinter library.
 Written by Shing Chi Leung at 21 February 2021
 '''
 
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+from collections import deque
+
 import yfinance  as yf
+import numpy as np
 import pandas as pd
 
 import tkinter as tk
@@ -18,11 +28,335 @@ from tkinter import Label, Message, ttk, Menu
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 
+# the folder of the cached daily prices, one Parquet file per pair with a
+# JSON file of the date ranges already downloaded for it
+CACHEDIR = "forex_cache"
+
+# the local cache of the daily prices of the pairs. A request only downloads
+# the parts of its date range which were never downloaded before, merges them
+# into the file of the pair and reads the result back from the file. The date
+# ranges are kept apart from the prices since weekends and holidays have no
+# price but need not be downloaded again
+class ForexCache():
+
+    def __init__(self, folder=CACHEDIR, download=None):
+
+        self.folder = folder
+
+        # the function fetching the prices as download(pair, start, end) with
+        # the end date excluded, like yf.download. It can be replaced by a
+        # local stand-in so that the cache works without the network
+        if download is None:
+            download = yf.download
+        self.download = download
+
+        # number of date ranges downloaded, for checking the cache
+        self.downloads = 0
+
+    def data_path(self, pair):
+        return os.path.join(self.folder, pair.replace("=", "_") + ".parquet")
+
+    def ranges_path(self, pair):
+        return os.path.join(self.folder, pair.replace("=", "_") + ".json")
+
+    # the cached prices and the downloaded date ranges of the pair, as a sorted
+    # list of (start, end) with the end excluded
+    def load(self, pair):
+
+        if os.path.exists(self.data_path(pair)):
+            df = pd.read_parquet(self.data_path(pair))
+        else:
+            df = None
+
+        ranges = []
+        if os.path.exists(self.ranges_path(pair)):
+            with open(self.ranges_path(pair)) as f:
+                ranges = [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in json.load(f)]
+
+        return df, ranges
+
+    def save(self, pair, df, ranges):
+
+        os.makedirs(self.folder, exist_ok=True)
+        df.to_parquet(self.data_path(pair))
+        with open(self.ranges_path(pair), "w") as f:
+            json.dump([(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")) for start, end in ranges], f)
+
+    # whether the range from start to end (excluded) is only weekends
+    def no_business_days(self, start, end):
+        return len(pd.bdate_range(start, end - pd.Timedelta(days=1))) == 0
+
+    # the parts of the range from start to end which are not in the ranges
+    def missing_ranges(self, ranges, start, end):
+
+        missing = []
+        cursor = start
+        for range_start, range_end in ranges:
+            if range_end <= cursor:
+                continue
+            if range_start >= end:
+                break
+            if range_start > cursor:
+                missing.append((cursor, range_start))
+            cursor = max(cursor, range_end)
+
+        if cursor < end:
+            missing.append((cursor, end))
+
+        return missing
+
+    # add a range to the sorted ranges, joining the ranges which overlap or touch
+    def add_range(self, ranges, start, end):
+
+        merged = []
+        for range_start, range_end in sorted(ranges + [(start, end)]):
+            if merged != [] and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+            else:
+                merged.append((range_start, range_end))
+
+        return merged
+
+    # the same columns as the cache whatever the version of yfinance, the
+    # newer ones give the columns as (price, ticker) even for one ticker
+    def normalize(self, df):
+
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.copy()
+            df.columns = df.columns.get_level_values(0)
+        if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+            df = df.copy()
+            df.index = df.index.tz_localize(None)
+
+        return df
+
+    # the daily prices of the pair from start to end (excluded), only the
+    # missing dates are downloaded
+    def get(self, pair, start, end):
+        return self.get_many([pair], start, end)[pair]
+
+    # the daily prices of every pair from start to end (excluded) as a
+    # dictionary. The pairs missing the same dates are downloaded together
+    # in one batch, which yfinance fetches in parallel threads, so several
+    # pairs take about the time of one
+    def get_many(self, pairs, start, end):
+
+        start = pd.Timestamp(start)
+        end = pd.Timestamp(end)
+        data = {pair: self.load(pair) for pair in pairs}
+
+        groups = {}
+        for pair in pairs:
+            for missing in self.missing_ranges(data[pair][1], start, end):
+                groups.setdefault(missing, []).append(pair)
+
+        # the prices of today are not final, so today and later are never
+        # marked as downloaded and are fetched again next time
+        today = pd.Timestamp.today().normalize()
+
+        changed = set()
+        for (range_start, range_end), group in groups.items():
+            tickers = group if len(group) > 1 else group[0]
+            batch = self.download(tickers, range_start.strftime("%Y-%m-%d"), range_end.strftime("%Y-%m-%d"))
+            self.downloads += 1
+
+            for pair in group:
+                new_df = self.normalize(self.split_batch(batch, pair, len(group)))
+                df, ranges = data[pair]
+
+                if len(new_df) > 0:
+                    if df is None or len(df) == 0:
+                        df = new_df
+                    else:
+                        df = pd.concat([df, new_df])
+                        df = df[~df.index.duplicated(keep="last")]
+                    changed.add(pair)
+
+                # a failed download gives no prices, so the range is only
+                # marked as downloaded if the pair got prices or the range
+                # has no business day at all
+                covered_end = min(range_end, today)
+                if covered_end > range_start and (len(new_df) > 0 or self.no_business_days(range_start, covered_end)):
+                    ranges = self.add_range(ranges, range_start, covered_end)
+                    changed.add(pair)
+
+                data[pair] = (df, ranges)
+
+        # the pairs with prices are saved before the error of the pairs
+        # without any, so their downloads are not lost
+        result = {}
+        failed = []
+        for pair in pairs:
+            df, ranges = data[pair]
+            if df is None:
+                failed.append(pair)
+                continue
+
+            if pair in changed:
+                self.save(pair, df.sort_index(), ranges)
+
+                # serve the result from the file like every other request
+                df = self.load(pair)[0]
+
+            result[pair] = df[(df.index >= start) & (df.index < end)]
+
+        if failed != []:
+            raise ValueError("No prices downloaded for {}".format(", ".join(failed)))
+
+        return result
+
+    # the prices of one pair of a batch download, which has the columns as
+    # (price, ticker). A date of the other pairs only has no price of the pair
+    def split_batch(self, batch, pair, count):
+
+        if count == 1:
+            return batch
+        if not isinstance(batch.columns, pd.MultiIndex) or pair not in batch.columns.get_level_values(1):
+            return batch.iloc[0:0]
+
+        return batch.xs(pair, axis=1, level=1).dropna(how="all")
+
+# the pairs of the app and their yfinance tickers
+FOREXPAIRS = {
+    "USDJPY": "USDJPY=X",
+    "EURJPY": "EURJPY=X",
+    "AUDJPY": "AUDJPY=X",
+}
+
+# milliseconds between the checks of the app for a finished download
+POLLTIME = 100
+
+# the spans of the exponential moving averages and the window of the
+# Bollinger's band with its width in standard deviations
+EMASPANS = (9, 20)
+BOLLINGERWINDOW = 20
+BOLLINGERWIDTH = 2
+
+# the indicator columns added to the data
+INDICATORS = ["EMA{}".format(span) for span in EMASPANS] + ["Mean", "Std", "Bol Hi", "Bol Lo"]
+
+# the indicators of the close prices updated row by row, so that the rows
+# appended to the data are computed without going over the old rows again.
+# The results are the same as the pandas ewm(span).mean() and
+# rolling(window).mean() and std() of the whole column
+class IndicatorEngine():
+
+    def __init__(self, spans=EMASPANS, window=BOLLINGERWINDOW):
+        self.spans = spans
+        self.window = window
+        self.reset()
+
+    # forget all the rows
+    def reset(self):
+
+        # pandas' ewm (adjust=True) divides the weighted sum of the prices
+        # by the sum of the weights, the old weights decay by 1-alpha every
+        # row even if the price is missing
+        self.decays = [1 - 2 / (span + 1) for span in self.spans]
+        self.ema_sums = [0.0] * len(self.spans)
+        self.ema_weights = [0.0] * len(self.spans)
+
+        # the prices of the last window rows, with the sum and the sum of
+        # squares of the valid ones. The prices are taken from a shift near
+        # their mean so that the sum of squares does not lose the digits of
+        # the variance, and the shift and the sums are renewed every window
+        # rows so that the rounding errors do not add up
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.valid = 0
+        self.shift = None
+        self.since_recenter = 0
+
+        self.rows = 0
+
+    # the indicators of the next rows of close prices as a dictionary of
+    # the indicator columns to arrays
+    def update(self, closes):
+
+        count = len(closes)
+        columns = {name: np.full(count, np.nan) for name in INDICATORS}
+        emas = [columns["EMA{}".format(span)] for span in self.spans]
+        means = columns["Mean"]
+        stds = columns["Std"]
+        window = self.window
+
+        for row in range(count):
+            price = float(closes[row])
+            valid = not math.isnan(price)
+
+            for n in range(len(self.spans)):
+                self.ema_sums[n] *= self.decays[n]
+                self.ema_weights[n] *= self.decays[n]
+                if valid:
+                    self.ema_sums[n] += price
+                    self.ema_weights[n] += 1.0
+                if self.ema_weights[n] > 0:
+                    emas[n][row] = self.ema_sums[n] / self.ema_weights[n]
+
+            if valid and self.shift is None:
+                self.shift = price
+            value = price - self.shift if valid else price
+
+            self.values.append(value)
+            if valid:
+                self.total += value
+                self.total_sq += value * value
+                self.valid += 1
+            if len(self.values) > window:
+                old = self.values.popleft()
+                if not math.isnan(old):
+                    self.total -= old
+                    self.total_sq -= old * old
+                    self.valid -= 1
+
+            self.since_recenter += 1
+            if self.since_recenter >= window and self.valid > 0:
+                self.recenter()
+
+            # like pandas, a window with a missing price has no value
+            if self.valid == window:
+                mean = self.total / window
+                variance = (self.total_sq - self.total * mean) / (window - 1)
+                means[row] = mean + self.shift
+                stds[row] = math.sqrt(variance) if variance > 0 else 0.0
+
+        columns["Bol Hi"] = means + stds * BOLLINGERWIDTH
+        columns["Bol Lo"] = means - stds * BOLLINGERWIDTH
+
+        self.rows += count
+
+        return columns
+
+    # take the prices of the window from their mean and sum them again
+    def recenter(self):
+
+        offset = self.total / self.valid
+        self.values = deque(value - offset for value in self.values)
+        self.shift += offset
+        self.total = 0.0
+        self.total_sq = 0.0
+        for value in self.values:
+            if not math.isnan(value):
+                self.total += value
+                self.total_sq += value * value
+        self.since_recenter = 0
+
 # This is the backend class for the app. It fetches and analyzes the data.
 class ForexHist():
 
-    def __init__(self):
+    def __init__(self, download=None):
         self.df = None
+
+        # the local cache of the prices, see ForexCache for the download function
+        self.cache = ForexCache(download=download)
+
+        # the indicators of the rows of df, and the pair of df
+        self.indicators = IndicatorEngine()
+        self.data_pair = None
+
+        # the close prices of the compared pairs on their shared dates
+        self.compare_df = None
         
         # the forex pair to look at
         self.pair = None
@@ -40,6 +374,9 @@ class ForexHist():
     def set_end_date(self, date):
         self.end_date = date
 
+    # the full pandas calculation of the indicators below is kept as the
+    # reference of the incremental IndicatorEngine
+
     # calculate Exponential moving average of period 9
     def get_EMA9(self):
         self.df["EMA9"] = self.df["Close"].ewm(span=9).mean()
@@ -56,14 +393,64 @@ class ForexHist():
         self.df["Bol Hi"] = self.df["Mean"] + self.df["Std"] * 2
         self.df["Bol Lo"] = self.df["Mean"] - self.df["Std"] * 2
 
-    # use yfinance module to fetch the data and analyze the data
+    # fetch the data through the cache and analyze the data. When the new
+    # data only adds rows after the old data, only the new rows are computed
     def get_data(self):
-        self. df = yf.download(self.pair, self.start_date, self.end_date)
-        print(self.df.tail(5))
+        df = self.cache.get(self.pair, self.start_date, self.end_date).copy()
+        print(df.tail(5))
 
-        self.get_EMA9()
-        self.get_EMA20()
-        self.get_Bollinger()
+        if self.extends_data(df):
+            start = len(self.df)
+            for name in INDICATORS:
+                df[name] = np.concatenate((self.df[name].to_numpy(), np.full(len(df) - start, np.nan)))
+        else:
+            start = 0
+            self.indicators.reset()
+
+        self.df = df
+        self.data_pair = self.pair
+        self.update_indicators(start)
+
+    # fetch several pairs in one go and keep their close prices on the dates
+    # that all of them have, rebased to 100 at the first date so that the
+    # pairs of different prices can be compared on one plot
+    def get_pairs_data(self, pairs):
+
+        data = self.cache.get_many(pairs, self.start_date, self.end_date)
+        closes = pd.concat([data[pair]["Close"].rename(pair) for pair in pairs], axis=1, join="inner").dropna()
+        if len(closes) > 0:
+            closes = closes / closes.iloc[0] * 100
+        self.compare_df = closes
+        print(self.compare_df.tail(5))
+
+    # add the bars after the last row of the data, only the indicators of
+    # the new rows are computed
+    def append_bars(self, bars):
+
+        bars = bars[bars.index > self.df.index[-1]]
+        start = len(self.df)
+        self.df = pd.concat([self.df, bars])
+        self.update_indicators(start)
+
+    # check if the data starts with the same rows as the old data
+    def extends_data(self, df):
+
+        if self.df is None or self.data_pair != self.pair or self.indicators.rows != len(self.df):
+            return False
+        if len(df) < len(self.df) or not df.index[:len(self.df)].equals(self.df.index):
+            return False
+
+        # the last prices can still change, then the old rows are not the same
+        return np.array_equal(df["Close"].to_numpy()[:len(self.df)], self.df["Close"].to_numpy(), equal_nan=True)
+
+    # compute the indicators of the rows from start
+    def update_indicators(self, start):
+
+        columns = self.indicators.update(self.df["Close"].to_numpy()[start:])
+        for name in INDICATORS:
+            if name not in self.df:
+                self.df[name] = np.nan
+            self.df.iloc[start:, self.df.columns.get_loc(name)] = columns[name]
 
 # this is the frontend class of the app. It adopts the backend class as a
 # variable and construct the GUI. It inherits the Tkinter class so that 
@@ -124,7 +511,7 @@ class ForexHistApp(tk.Tk):
 
         self.forex_pair = tk.StringVar()
         self.forex_pair_chosen = ttk.Combobox(self.header_frame, width=10, textvariable=self.forex_pair, state="readonly")
-        self.forex_pair_chosen["values"] = ("USDJPY", "EURJPY", "AUDJPY")
+        self.forex_pair_chosen["values"] = tuple(FOREXPAIRS)
         self.forex_pair_chosen.current(0)
         self.forex_pair_chosen.grid(column=0, row=2)
 
@@ -166,20 +553,33 @@ class ForexHistApp(tk.Tk):
         self.bollinger_button = ttk.Button(self.header_frame, text="Bollinger", command=self.plot_bollinger, state="disable")
         self.bollinger_button.grid(column=3,row=3)
 
+        # comparison section, the chosen pairs are plotted together
+        self.compare_label = ttk.Label(self.header_frame, text = "Compare:")
+        self.compare_label.grid(column=0, row=4, sticky="W")
+
+        self.compare_choices = {}
+        for column, name in enumerate(FOREXPAIRS):
+            self.compare_choices[name] = tk.BooleanVar(value=True)
+            ttk.Checkbutton(self.header_frame, text=name, variable=self.compare_choices[name]).grid(column=column, row=5, sticky="W")
+
+        self.compare_button = ttk.Button(self.header_frame, text="Compare!", command=self.compare_pairs)
+        self.compare_button.grid(column=3,row=4)
+
+        # the state of the download
+        self.status = tk.StringVar()
+        self.status_label = ttk.Label(self.header_frame, textvariable=self.status)
+        self.status_label.grid(column=0, row=6, columnspan=4, sticky="W")
+
     def get_data(self):
 
-        forex_pair = self.forex_pair.get()
-        if forex_pair == "USDJPY":
-            name = "USDJPY=X" 
-        elif forex_pair == "EURJPY":
-            name = "EURJPY=X" 
-        elif forex_pair == "AUDJPY":
-            name = "AUDJPY=X" 
+        name = FOREXPAIRS[self.forex_pair.get()]
 
         self.forex_hist.set_pair(name)
         self.forex_hist.set_start_date(self.start_date.get())
         self.forex_hist.set_end_date(self.end_date.get())
-        self.forex_hist.get_data()
+        self.run_in_background(self.forex_hist.get_data, self.show_data)
+
+    def show_data(self, result):
 
         # activate the indicator buttons
         self.ema9_button.state(["!disabled"])
@@ -188,18 +588,84 @@ class ForexHistApp(tk.Tk):
 
         self.plot_data()
 
+    # fetch all the chosen pairs together and plot them on one graph
+    def compare_pairs(self):
+
+        pairs = [FOREXPAIRS[name] for name in FOREXPAIRS if self.compare_choices[name].get()]
+        if pairs == []:
+            self.status.set("Choose the pairs to compare")
+            return
+
+        self.forex_hist.set_start_date(self.start_date.get())
+        self.forex_hist.set_end_date(self.end_date.get())
+        self.run_in_background(lambda: self.forex_hist.get_pairs_data(pairs), self.show_compare)
+
+    def show_compare(self, result):
+
+        # the indicators are of the single pair only
+        self.ema9_button.state(["disabled"])
+        self.ema20_button.state(["disabled"])
+        self.bollinger_button.state(["disabled"])
+
+        self.plot_compare()
+
+    # run the download in a thread so that the GUI keeps running, then call
+    # done with its result in the GUI thread when it is finished. The
+    # buttons are disabled meanwhile since the thread changes the backend
+    def run_in_background(self, job, done):
+
+        self.set_buttons(["disabled"])
+        self.status.set("Fetching...")
+        results = queue.Queue()
+
+        def work():
+            start = time.perf_counter()
+            try:
+                results.put((True, job(), time.perf_counter() - start))
+            except Exception as error:
+                results.put((False, error, time.perf_counter() - start))
+
+        threading.Thread(target=work, daemon=True).start()
+        self.after(POLLTIME, self.poll_result, results, done)
+
+    # check the thread of run_in_background for its result
+    def poll_result(self, results, done):
+
+        try:
+            ok, value, elapsed = results.get_nowait()
+        except queue.Empty:
+            self.after(POLLTIME, self.poll_result, results, done)
+            return
+
+        self.set_buttons(["!disabled"])
+        if ok:
+            self.status.set("Fetched in {:.2f}s".format(elapsed))
+            done(value)
+        else:
+            self.status.set("Failed: {}".format(value))
+
+    # change the state of the fetch buttons, and of the indicator buttons
+    # if there is data of a single pair
+    def set_buttons(self, state):
+
+        self.get_data_button.state(state)
+        self.compare_button.state(state)
+        if self.forex_hist.df is not None and self.compare_lines == []:
+            self.ema9_button.state(state)
+            self.ema20_button.state(state)
+            self.bollinger_button.state(state)
+
     def plot_data(self):
 
+        self.remove_compare_lines()
+
         if self.price_line == None:
             self.price_line, = self.plotax.plot(self.forex_hist.df.index, self.forex_hist.df["Close"])
-            self.canvas.draw()
             print(self.price_line)
         else:
             self.price_line.set_xdata(self.forex_hist.df.index.to_numpy())
             self.price_line.set_ydata(self.forex_hist.df["Close"].to_numpy())
-
-            self.plotax.set_xlim(min(self.forex_hist.df.index), max(self.forex_hist.df.index))
-            self.plotax.set_ylim(min(self.forex_hist.df["Close"]), max(self.forex_hist.df["Close"]))
+            self.price_line.set_linestyle("solid")
 
             # also remove indicator lines if they are plot on the canvas
             if self.ema9_line != None:
@@ -214,8 +680,44 @@ class ForexHistApp(tk.Tk):
             if self.bollo_line != None:
                 self.bollo_line.set_linestyle("None")
 
-            # need to update the GUI screen
-            self.canvas.draw()
+        self.plotax.set_xlim(min(self.forex_hist.df.index), max(self.forex_hist.df.index))
+        self.plotax.set_ylim(min(self.forex_hist.df["Close"]), max(self.forex_hist.df["Close"]))
+
+        # need to update the GUI screen
+        self.canvas.draw()
+
+    # draw the rebased prices of the compared pairs, the lines of the single
+    # pair are hidden the same way as the indicators
+    def plot_compare(self):
+
+        for line in (self.price_line, self.ema9_line, self.ema20_line, self.bolhi_line, self.bollo_line):
+            if line != None:
+                line.set_linestyle("None")
+
+        self.remove_compare_lines()
+
+        df = self.forex_hist.compare_df
+        for pair in df.columns:
+            line, = self.plotax.plot(df.index, df[pair], label=pair.replace("=X", ""))
+            self.compare_lines.append(line)
+        self.plotax.legend()
+
+        if len(df) > 0:
+            self.plotax.set_xlim(min(df.index), max(df.index))
+            self.plotax.set_ylim(df.min().min(), df.max().max())
+
+        # need to update the GUI screen
+        self.canvas.draw()
+
+    def remove_compare_lines(self):
+
+        for line in self.compare_lines:
+            line.remove()
+        self.compare_lines = []
+
+        legend = self.plotax.get_legend()
+        if legend != None:
+            legend.remove()
 
     # draw the EMA9 data, if there is no previous data, plot the data and get the line2D object
     # if there is previous line2D object, replace the old data in line2D object with the new one
@@ -317,6 +819,7 @@ class ForexHistApp(tk.Tk):
         self.ema20_line = None
         self.bolhi_line = None
         self.bollo_line = None
+        self.compare_lines = []
 
 
 # after the frontend and backend are done, to operate the code will
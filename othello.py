@@ -13,8 +13,19 @@ import pygame
 from pygame.locals import *
 
 import sys
+import time
+import argparse
+import logging
+import multiprocessing
+import threading
+import queue
+import os
+import mmap
+import struct
 
-from random import randint, choice
+import numpy as np
+
+from random import randint, choice, Random
 
 # Parameter setup of the game
 WINDOWWIDTH = 400
@@ -25,10 +36,11 @@ BASICFONTSIZE = 20
 # screen update rate
 FPS = 30
 
-# Chess size
+# Chess size, on other board sizes than 8x8 the app uses GRIDSIZE // size
 TILESIZE = 50
 
-# the board size
+# the board size, on other board sizes than 8x8 the app uses the largest
+# multiple of the tile size which fits
 GRIDSIZE = 400
 
 # the png file size (width*height)
@@ -43,41 +55,783 @@ MARGINSIZE = 5
 # purple-ish colour for a pleasant outlook
 BGCOLOR = (100, 100, 255)
 
-# load all the image files
-GRIDIMG = pygame.image.load("othello_grid.png")
-WHITEIMG = pygame.image.load("othello_white.png")
-BLACKIMG = pygame.image.load("othello_black.png")
+# the board and its lines, for board sizes without a grid image
+BOARDCOLOR = (0, 130, 60)
+LINECOLOR = (0, 0, 0)
+
+# number of processes for the search of the AI
+WORKERS = max(1, multiprocessing.cpu_count() - 1)
+
+# the shortest time (in ms) before the AI plays its move
+AIWAIT = 1000
+
+# difficulties as (search depth, time limit in seconds per move),
+# without a time limit the search stops at the fixed depth
+EASYLEVEL = (1, None)
+MEDIUMLEVEL = (3, 0.5)
+HARDLEVEL = (5, 2.0)
+
+# all the image files, they are only loaded by the app when first drawn
+# so that the backend can be used without them
+IMAGEFILES = {
+    "grid": "othello_grid.png",
+    "white": "othello_white.png",
+    "black": "othello_black.png",
+
+    # For the toolbar use
+    "black_small": "othello_black_dis.png",
+
+    # button image files for difficulties
+    "easy": "tictactoe_easy_btn.png",
+    "medium": "tictactoe_medium_btn.png",
+    "hard": "tictactoe_hard_btn.png",
+    "reset": "tictactoe_reset_btn.png",
+}
+
+# the debug output of the game goes through this logger, it is only shown
+# when the app is started by main() or when the caller sets up logging
+logger = logging.getLogger("othello")
+
+# the bitboard setup of the engine. Every square of the board is one bit
+# of an integer, square (i, j) of the padded grid maps to bit
+# (i-1)*size + (j-1), which is 64 bits for the default 8x8 board. Each side
+# keeps its own integer, so that the move generation and the flipping are
+# done by shift-and-mask on the whole board
+BOARDSIZE = 8
+
+# the board sizes supported by the engine
+BOARDSIZES = (6, 8, 10)
+
+# the eight directions on the padded grid as (row step, column step)
+GRIDDIRECTIONS = [(0,1), (0,-1), (1,0), (-1,0), (1,1), (1,-1), (-1,1), (-1,-1)]
+
+# count the number of chess on a bitboard
+def count_bits(bits):
+    return bits.bit_count()
+
+# the eight directions of a board size as (shift, mask), positive shift moves
+# to higher bits. The mask clears the column which a chess on the edge
+# would wrap around to on the other side of the board
+def board_directions(size):
+
+    full = (1 << size*size) - 1
+    file_a = sum(1 << (row*size) for row in range(size))
+    file_h = file_a << (size-1)
+    not_file_a = full & ~file_a
+    not_file_h = full & ~file_h
+
+    return [
+        (1, not_file_a),                # right
+        (-1, not_file_h),               # left
+        (size, full),                   # down
+        (-size, full),                  # up
+        (size+1, not_file_a),           # down right
+        (size-1, not_file_h),           # down left
+        (-size+1, not_file_a),          # up right
+        (-size-1, not_file_h),          # up left
+    ]
+
+# the move generation of a board size as the two functions bit_moves and
+# bit_flips. The tables of the size are bound to the functions when they are
+# made, so they run as fast as functions written for that one size
+def make_move_generator(size):
+
+    full = (1 << size*size) - 1
+    directions = board_directions(size)
+    steps = range(size-3)
+
+    # all the empty squares where the side "me" can place a chess, i.e. 
+    # the squares which close at least one line of the opponent's chess
+    def bit_moves(me, opp):
+
+        empty = ~(me | opp) & full
+        moves = 0
+
+        # the shifts are written out for each sign since this is the
+        # innermost loop of the search
+        for shift, mask in directions:
+
+            # only the opponent's chess which cannot wrap around can be on a line
+            opp_mask = opp & mask
+
+            # walk along the lines of opponent's chess which touch our chess,
+            # at most size-2 opponent's chess can be in between, and one
+            # more step from the end of the line must land on an empty square
+            if shift > 0:
+                line = (me << shift) & opp_mask
+                for k in steps:
+                    line |= (line << shift) & opp_mask
+                moves |= (line << shift) & mask & empty
+            else:
+                shift = -shift
+                line = (me >> shift) & opp_mask
+                for k in steps:
+                    line |= (line >> shift) & opp_mask
+                moves |= (line >> shift) & mask & empty
+
+        return moves
+
+    # all the opponent's chess flipped when "me" places a chess on the square
+    def bit_flips(me, opp, square):
+
+        move = 1 << square
+        flips = 0
+
+        for shift, mask in directions:
+
+            # collect the opponent's chess until the line stops, the line
+            # only flips if it is closed by our own chess
+            opp_mask = opp & mask
+            line = 0
+            if shift > 0:
+                bits = (move << shift) & opp_mask
+                while bits:
+                    line |= bits
+                    bits = (bits << shift) & opp_mask
+                if (line << shift) & mask & me:
+                    flips |= line
+            else:
+                shift = -shift
+                bits = (move >> shift) & opp_mask
+                while bits:
+                    line |= bits
+                    bits = (bits >> shift) & opp_mask
+                if (line >> shift) & mask & me:
+                    flips |= line
+
+        return flips
+
+    return bit_moves, bit_flips
+
+# the search is deepened up to this depth when only the time limit is set
+MAXDEPTH = max(BOARDSIZES)**2
+
+# the search checks the clock once every this many calls of the search
+TIMECHECK = 1024
+
+# seconds between the checks of a cancelled search while waiting for the workers
+POLLTIME = 0.05
+
+# the "square" of a pass move, when the player to move has no legal move
+PASS = -1
+
+# larger than any score of the search, for the full window
+SCOREBOUND = 1 << 30
+
+# raised inside the search when the time budget of the move runs out
+# or when the search is cancelled
+class SearchTimeout(Exception):
+    pass
+
+# Zobrist keys, one random 64-bit number for every square and colour and one
+# for the side to move. The hash of a position is the XOR of the keys of its
+# chess, so that a move only XORs the keys of the squares which change.
+# A fixed seed keeps the hashes the same between runs and processes
+ZOBRISTSEED = 20210220
+
+# the Zobrist keys of a board size as (keys of the squares of each colour,
+# keys of a flipped square, key of the side to move)
+def zobrist_keys(size):
+
+    zobrist_random = Random(ZOBRISTSEED)
+    zobrist = [[zobrist_random.getrandbits(64) for square in range(size*size)] for colour in range(2)]
+    zobrist_flip = [zobrist[0][square] ^ zobrist[1][square] for square in range(size*size)]
+    zobrist_player = zobrist_random.getrandbits(64)
+
+    return zobrist, zobrist_flip, zobrist_player
+
+# static value of the squares for ordering the moves of the search, by the
+# distance of the square from the nearest edge in rows and in columns. The
+# corners first and the squares next to the corners last
+EDGEWEIGHT = [
+    [120, -20,  20,   5],
+    [-20, -40,  -5,  -5],
+    [ 20,  -5,  15,   3],
+    [  5,  -5,   3,   3],
+]
+
+# the static value of every square of a board size
+def square_weights(size):
+
+    weights = []
+    for row in range(size):
+        for column in range(size):
+            weights.append(EDGEWEIGHT[min(row, size-1-row, 3)][min(column, size-1-column, 3)])
+
+    return weights
+
+# the exact endgame solver takes over with this many empty squares or less,
+# and below PARITYEMPTIES it orders the moves by the parity of the regions
+# instead of by the mobility of the opponent (fastest first)
+ENDGAMEEMPTIES = 14
+PARITYEMPTIES = 6
+ENDGAMESCORE = max(BOARDSIZES)**2 + 1
+
+# all the tables of one board size, shared by the engines of that size
+class Board():
+
+    def __init__(self, size):
+
+        if size not in BOARDSIZES:
+            raise ValueError("board size must be one of {}".format(BOARDSIZES))
+
+        # number of rows and columns, of squares, and the bits of all squares
+        self.size = size
+        self.squares = size*size
+        self.full = (1 << self.squares) - 1
+
+        # the move generation, see make_move_generator
+        self.directions = board_directions(size)
+        self.moves, self.flips = make_move_generator(size)
+
+        # static value of every square for the move ordering
+        self.weights = square_weights(size)
+
+        # the four quadrants of the board for the parity of the empty regions
+        half = size//2
+        self.quadrants = [
+            sum(1 << (row*size + column) for row in rows for column in columns)
+            for rows in (range(0, half), range(half, size))
+            for columns in (range(0, half), range(half, size))
+        ]
+
+        self.zobrist, self.zobrist_flip, self.zobrist_player = zobrist_keys(size)
+
+        # for every square, the rays of the grid from it as the (i, j) of the
+        # squares in each direction up to the edge. Only the rays of two
+        # squares or more can close a line
+        self.rays = []
+        for square in range(self.squares):
+            i, j = self.to_action(square)
+            rays = []
+            for di, dj in GRIDDIRECTIONS:
+                ray = []
+                i2 = i + di
+                j2 = j + dj
+                while 1 <= i2 <= size and 1 <= j2 <= size:
+                    ray.append((i2, j2))
+                    i2 += di
+                    j2 += dj
+                if len(ray) > 1:
+                    rays.append(tuple(ray))
+            self.rays.append(tuple(rays))
+
+    # the hash of a position from scratch, make_move updates it move by move
+    def hash(self, black, white, player):
+
+        key = 0
+        for colour, bits in enumerate((black, white)):
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                key ^= self.zobrist[colour][bit.bit_length() - 1]
+
+        if player == 1:
+            key ^= self.zobrist_player
+
+        return key
+
+    # convert between the padded grid and the bit index of a square
+    def to_square(self, action):
+        i, j = action
+        return (i-1)*self.size + (j-1)
+
+    def to_action(self, square):
+        return (square//self.size + 1, square%self.size + 1)
+
+# the tables of every board size, made when the size is first used
+BOARDS = {}
+
+def get_board(size):
+    if size not in BOARDS:
+        BOARDS[size] = Board(size)
+    return BOARDS[size]
+
+# the tables of the default board are also kept as module names
+DEFAULTBOARD = get_board(BOARDSIZE)
+FULLBOARD = DEFAULTBOARD.full
+DIRECTIONS = DEFAULTBOARD.directions
+SQUAREWEIGHT = DEFAULTBOARD.weights
+QUADRANTS = DEFAULTBOARD.quadrants
+ZOBRIST = DEFAULTBOARD.zobrist
+ZOBRISTFLIP = DEFAULTBOARD.zobrist_flip
+ZOBRISTPLAYER = DEFAULTBOARD.zobrist_player
+bit_moves = DEFAULTBOARD.moves
+bit_flips = DEFAULTBOARD.flips
+zobrist_hash = DEFAULTBOARD.hash
+action_to_square = DEFAULTBOARD.to_square
+square_to_action = DEFAULTBOARD.to_action
+
+# ordering bonus of the best move from the table and of the killer moves,
+# both are larger than any static weight or history score
+HINTBONUS = 1 << 40
+KILLERBONUS = 1 << 39
+
+# the kind of score stored in the transposition table, an exact score or
+# a lower/upper bound when the search of the node was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# default size of the transposition table as the power of 2 of the entries
+TABLEBITS = 18
+
+# a fixed-size hash table of searched positions. Each slot keeps one entry
+# (key, depth, flag, score, best square, age). A new entry replaces the old
+# one in its slot if the old one is from an earlier search (age) or was
+# searched less deep
+class TranspositionTable():
+
+    def __init__(self, bits=TABLEBITS):
+
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+
+        # the age is increased for every new search (one move of the game)
+        self.age = 0
+
+        # counters to check how much the table helps the search
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    # remove all entries and counters
+    def clear(self):
+        self.slots = [None] * self.size
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.cutoffs = 0
+        self.stores = 0
+
+    # the entries of the earlier searches become the first to be replaced
+    def new_search(self):
+        self.age += 1
+
+    # look up a position, return its entry or None
+    def probe(self, key):
+
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    # store the search result of a position if it may replace the old entry
+    def store(self, key, depth, flag, score, best):
+
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None or entry[5] != self.age or depth >= entry[1]:
+            self.slots[index] = (key, depth, flag, score, best, self.age)
+            self.stores += 1
+
+    # summary of the counters and the filled slots for checking the table
+    def stats(self):
+
+        probes = self.hits + self.misses
+        filled = self.size - self.slots.count(None)
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "cutoffs": self.cutoffs,
+            "stores": self.stores,
+            "hit_rate": self.hits / probes if probes > 0 else 0.0,
+            "filled": filled / self.size,
+        }
+
+# default weights of the batch evaluator, on top of the square weights
+# every chess counts DISCWEIGHT, every extra move MOBILITYWEIGHT and every
+# extra chess next to an empty square (frontier chess) FRONTIERWEIGHT
+DISCWEIGHT = 1
+MOBILITYWEIGHT = 10
+FRONTIERWEIGHT = -5
+
+# number of features of the batch evaluator on the default board, and the
+# file of the fitted weights (see othello_fit.py) which the app loads at
+# startup if it exists
+FEATURES = BOARDSIZE*BOARDSIZE + 2
+WEIGHTSFILE = "othello_weights.npy"
+
+# count the bits of every number of an array of bitboards
+def count_bits_array(bits):
+    return np.unpackbits(bits.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1, dtype=np.int64)
+
+# evaluates many positions in one go with NumPy instead of one position
+# at a time. The positions are given as arrays of the bitboards of player 0
+# and player 1, which must fit in 64 bits (boards up to 8x8). The score is
+# the weighted sum of the features below, from the side of player 0, and
+# always an integer so that equal scores stay equal
+#   - one feature per square: +1 for a chess of player 0, -1 for player 1
+#   - mobility: number of moves of player 0 minus those of player 1
+#   - frontier: number of frontier chess of player 0 minus those of player 1
+class BatchEvaluator():
+
+    def __init__(self, weights=None, size=BOARDSIZE):
+
+        board = get_board(size)
+        if board.squares > 64:
+            raise ValueError("the batch evaluator needs a board of at most 8x8")
+        self.size = size
+        self.squares = board.squares
+
+        features = board.squares + 2
+        if weights is None:
+            weights = [weight + DISCWEIGHT for weight in board.weights] + [MOBILITYWEIGHT, FRONTIERWEIGHT]
+        self.weights = np.array(weights, dtype=np.int64)
+        if self.weights.shape != (features,):
+            raise ValueError("expected {} weights, got {}".format(features, self.weights.shape))
+
+        # the directions of the bitboards as columns of NumPy numbers, the
+        # four directions with a left shift and the four with a right shift
+        # are each done in one array operation
+        self.full = np.uint64(board.full)
+        self.steps = range(size-3)
+        self.left_shifts = np.array([[shift] for shift, mask in board.directions if shift > 0], dtype=np.uint64)
+        self.left_masks = np.array([[mask] for shift, mask in board.directions if shift > 0], dtype=np.uint64)
+        self.right_shifts = np.array([[-shift] for shift, mask in board.directions if shift < 0], dtype=np.uint64)
+        self.right_masks = np.array([[mask] for shift, mask in board.directions if shift < 0], dtype=np.uint64)
+
+    # the moves of all the positions, same as bit_moves
+    def moves(self, me, opp):
+
+        empty = ~(me | opp) & self.full
+
+        # one row for each direction
+        shifts = self.left_shifts
+        opp_mask = opp & self.left_masks
+        line = (me << shifts) & opp_mask
+        for k in self.steps:
+            line |= (line << shifts) & opp_mask
+        moves = np.bitwise_or.reduce((line << shifts) & self.left_masks, axis=0)
+
+        shifts = self.right_shifts
+        opp_mask = opp & self.right_masks
+        line = (me >> shifts) & opp_mask
+        for k in self.steps:
+            line |= (line >> shifts) & opp_mask
+        moves |= np.bitwise_or.reduce((line >> shifts) & self.right_masks, axis=0)
+
+        return moves & empty
+
+    # the chess next to at least one empty square
+    def frontier(self, bits, empty):
+
+        near_empty = np.bitwise_or.reduce((empty << self.left_shifts) & self.left_masks, axis=0)
+        near_empty |= np.bitwise_or.reduce((empty >> self.right_shifts) & self.right_masks, axis=0)
+
+        return bits & near_empty
+
+    # the feature matrix of the positions, one row per position
+    def features(self, black, white):
+
+        count = len(black)
+
+        # both players are done in the same arrays, player 0 in the first
+        # half and player 1 in the second half
+        me = np.array(list(black) + list(white), dtype="<u8")
+        opp = np.concatenate((me[count:], me[:count]))
+        empty = ~(me | opp) & self.full
+
+        # bit k of a bitboard goes to column k
+        squares = np.unpackbits(me.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")[:, :self.squares].astype(np.int64)
+        squares = squares[:count] - squares[count:]
+
+        mobility = count_bits_array(self.moves(me, opp))
+        frontier = count_bits_array(self.frontier(me, empty))
+
+        return np.column_stack((squares, mobility[:count] - mobility[count:], frontier[:count] - frontier[count:]))
+
+    # the scores of the positions as a NumPy array
+    def evaluate(self, black, white):
+        return self.features(black, white) @ self.weights
+
+    # save the weights as a NumPy array file, which is a short header
+    # followed by the raw numbers so that it loads without any parsing
+    def save(self, path):
+        np.save(path, self.weights)
+
+    # the evaluator with the weights of the file
+    @staticmethod
+    def load(path, size=BOARDSIZE):
+        return BatchEvaluator(np.load(path), size)
+
+# the opening book file starts with a header (magic, version, number of
+# records, search depth), followed by fixed-size records (position hash,
+# square, score) sorted by the hash. A position has one record for each
+# of its best moves
+BOOKFILE = "othello_book.bin"
+BOOKMAGIC = b"OTHBOOK"
+BOOKVERSION = 1
+BOOKHEADER = struct.Struct("<7sBIH")
+BOOKRECORD = struct.Struct("<QBh")
+
+# the opening book built offline by deep searches (see othello_book.py). The
+# file is memory-mapped and searched by bisection, so it is not read into memory
+class OpeningBook():
+
+    def __init__(self, path):
+
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # the book is only used by searches at least as deep as the book's
+        magic, version, count, depth = BOOKHEADER.unpack_from(self.data, 0)
+        if magic != BOOKMAGIC or version != BOOKVERSION:
+            self.close()
+            raise ValueError("{} is not an Othello opening book".format(path))
+        self.count = count
+        self.depth = depth
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    # the record as (key, square, score)
+    def record(self, index):
+        return BOOKRECORD.unpack_from(self.data, BOOKHEADER.size + index*BOOKRECORD.size)
+
+    # all the records of a position, empty if it is not in the book
+    def probe(self, key):
+
+        # find the first record with a hash not less than the key
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        records = []
+        while low < self.count:
+            record = self.record(low)
+            if record[0] != key:
+                break
+            records.append(record)
+            low += 1
+
+        return records
+
+    # write the book from a list of (key, square, score) searched to the depth
+    @staticmethod
+    def write(path, records, depth):
+
+        records = sorted(records)
+        with open(path, "wb") as f:
+            f.write(BOOKHEADER.pack(BOOKMAGIC, BOOKVERSION, len(records), depth))
+            for record in records:
+                f.write(BOOKRECORD.pack(*record))
 
-# For the toolbar use
-BLACKIMG2 = pygame.image.load("othello_black_dis.png")
+# the position searched by the engine. It is changed in place by make_move,
+# which records the flipped chess on the undo stack, and restored by
+# unmake_move. The chess count of both players is kept up to date with
+# the moves so the score never needs to count the whole board
+class Position():
 
-# button image files for difficulties
-EASYBTN = pygame.image.load("tictactoe_easy_btn.png")
-MEDIUMBTN = pygame.image.load("tictactoe_medium_btn.png")
-HARDBTN = pygame.image.load("tictactoe_hard_btn.png")
-RESETBTN = pygame.image.load("tictactoe_reset_btn.png")
+    def __init__(self, black, white, player, board=DEFAULTBOARD):
+
+        # the tables of the board size
+        self.board = board
+
+        # bitboards of player 0 and player 1, and their number of chess
+        self.bits = [black, white]
+        self.count = [count_bits(black), count_bits(white)]
+
+        # the player to move and the Zobrist hash of the position
+        self.player = player
+        self.key = board.hash(black, white, player)
+
+        # (square, flips, key before the move) of every move made,
+        # the square is PASS for a pass move
+        self.undo = []
+
+    # net number of chess of player 0
+    def score(self):
+        return self.count[0] - self.count[1]
+
+    # the legal moves of the player to move as a bitboard
+    def moves(self):
+        player = self.player
+        return self.board.moves(self.bits[player], self.bits[1-player])
+
+    # place a chess of the player to move and flip the chess it closes
+    def make_move(self, square):
+
+        player = self.player
+        other = 1 - player
+        bits = self.bits
+        board = self.board
+
+        flips = board.flips(bits[player], bits[other], square)
+        key = self.key
+        self.undo.append((square, flips, key))
+
+        bits[player] |= flips | (1 << square)
+        bits[other] ^= flips
+
+        flipped = flips.bit_count()
+        count = self.count
+        count[player] += flipped + 1
+        count[other] -= flipped
+
+        # only the squares which change are XORed into the hash
+        zobrist_flip = board.zobrist_flip
+        key ^= board.zobrist[player][square] ^ board.zobrist_player
+        while flips:
+            flip = flips & -flips
+            flips ^= flip
+            key ^= zobrist_flip[flip.bit_length() - 1]
+        self.key = key
+        self.player = other
+
+    # the player to move has no legal move and the turn goes to the other
+    # player, only the player to move changes
+    def make_pass(self):
+        self.undo.append((PASS, 0, self.key))
+        self.key ^= self.board.zobrist_player
+        self.player = 1 - self.player
+
+    # take back the last move made, a pass move included
+    def unmake_move(self):
+
+        square, flips, key = self.undo.pop()
+        other = self.player
+        player = 1 - other
+        bits = self.bits
+
+        if square == PASS:
+            self.key = key
+            self.player = player
+            return
+
+        bits[player] ^= flips | (1 << square)
+        bits[other] |= flips
+
+        flipped = flips.bit_count()
+        count = self.count
+        count[player] -= flipped + 1
+        count[other] += flipped
+
+        self.key = key
+        self.player = player
+
+# the engine of a worker process of the parallel search. It is kept between
+# the tasks so that its transposition table and history are reused
+worker_othello = None
+
+# search one root move in a worker process, the task is the tuple of the
+# arguments of Othello.search_move and the settings of the engine
+def search_move_task(task):
+
+    global worker_othello
+
+    search_id, use_table, move_ordering, size, evaluator = task[:5]
+    if worker_othello is None or worker_othello.move_ordering != move_ordering or (worker_othello.table is not None) != use_table or worker_othello.board.size != size:
+        worker_othello = Othello(use_table, move_ordering, size)
+        worker_othello.search_id = None
+    worker_othello.evaluator = evaluator
+
+    # a new root position starts a new search of the worker engine
+    if worker_othello.search_id != search_id:
+        worker_othello.search_id = search_id
+        worker_othello.new_search()
+
+    return worker_othello.search_move(*task[5:])
 
 # the backend class for the Othello app. It contains the game 
 # logic and rely on the Tree class for building the decision tree
 class Othello():
 
-    def __init__(self):
+    def __init__(self, use_table=True, move_ordering=True, size=BOARDSIZE):
+
+        # the tables of the board size, one of BOARDSIZES
+        self.board = get_board(size)
 
         # default is 8x8, and a buffer one row/column to prevent overflow
-        self.grid = [[0 for i in range(10)] for j in range(10)]
+        self.grid = [[0 for i in range(size+2)] for j in range(size+2)]
 
         # standard starting setup for Othello
-        self.grid[4][4] = 1
-        self.grid[4][5] = -1
-        self.grid[5][4] = -1
-        self.grid[5][5] = 1
+        self.clean_grid()
         #self.grid[1][0] = 1
 
         # the player who has just done the move
         self.player = 0 #randint(0,1) 0 for player and 1 for AI
 
-        # the difficulty level, can be changed during game
+        # the bitboards of player 0 and player 1, updated with the grid by
+        # every move so that the end of the game is found without a scan
+        # (set up by clean_grid)
+
+        # the difficulty level, can be changed during game. It is the
+        # search depth, and with a time limit (in seconds) per move the
+        # search keeps deepening after that depth until the time runs out
         self.decision_level = 1
+        self.time_limit = None
+
+        # number of nodes visited by the last search, its completed depth,
+        # its score and the time it took
+        self.nodes = 0
+        self.search_depth = 0
+        self.search_score = 0
+        self.search_time = 0.0
+        self.deadline = None
+
+        # calls of the search left until the next check of the clock and of
+        # the cancel event. It is apart from the node count, which jumps by
+        # all the children of a node scored in one go by the evaluator
+        self.until_check = TIMECHECK
+
+        # order the moves of the search by the table, the killer moves, the
+        # history of cutoffs and the static square weights
+        self.move_ordering = move_ordering
+        self.killers = [[-1, -1] for ply in range(MAXDEPTH+1)]
+        self.history = [[0]*self.board.squares for player in range(2)]
+        self.root_depth = 0
+
+        # the evaluation of the positions at the end of the search, the net
+        # number of chess if None, otherwise a BatchEvaluator which scores
+        # all the moves of a node at the last ply in one go
+        self.evaluator = None
+
+        # whether the root starts from the worst score like with an
+        # evaluator, so that the net number of chess gives only the real
+        # best moves with their score, as the opening book needs
+        self.exact_root = False
+
+        # exact endgame solver, the number of empty squares to start with,
+        # whether the exact disc difference or only win/draw/loss is solved,
+        # and the time and nodes of the last solve
+        self.endgame_empties = ENDGAMEEMPTIES
+        self.endgame_exact = True
+        self.endgame = False
+        self.endgame_time = 0.0
+        self.endgame_nodes = 0
+
+        # number of processes for the parallel search, the pool of worker
+        # processes is started with the first parallel search
+        self.workers = 1
+        self.pool = None
+        self.search_id = 0
+
+        # set from another thread to stop the search in progress
+        self.cancel = threading.Event()
+
+        # opening book, probed before any search, None if not loaded
+        self.book = None
+        self.book_hit = False
+
+        # transposition table of the search, None if switched off
+        self.table = None
+        self.set_table(use_table)
 
         # flag for end game
         self.end_game = False
@@ -91,26 +845,91 @@ class Othello():
     def switch_player(self):
         self.player = (self.player+1)%2
 
-    # update decision-tree depth
-    def set_decision_level(self, value):
+    # update decision-tree depth, and the time limit per move if given
+    def set_decision_level(self, value, time_limit=None):
         self.decision_level = value
+        self.time_limit = time_limit
+
+    # number of processes for the search, the root moves are split among
+    # them when more than one. The pool is restarted if the number changes
+    def set_workers(self, value):
+        if value != self.workers:
+            self.close_pool()
+        self.workers = max(1, value)
+
+    # stop the search in progress as soon as possible, the search returns
+    # no move. The flag must be cleared before the next search
+    def cancel_search(self):
+        self.cancel.set()
+
+    def clear_cancel(self):
+        self.cancel.clear()
+
+    # stop the worker processes of the parallel search
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    # load the opening book file, or remove the book if the path is None
+    def set_book(self, path):
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if path is not None:
+            self.book = OpeningBook(path)
+
+    # the evaluator of the search, None for the net number of chess. Any
+    # object with an evaluate(black, white) method can be used, which takes
+    # lists of the bitboards of player 0 and player 1 and returns an array
+    # of integer scores from the side of player 0. The worker processes
+    # keep their tables between the searches, so they are stopped as well
+    def set_evaluator(self, evaluator):
+        self.evaluator = evaluator
+        if self.table is not None:
+            self.table.clear()
+        self.close_pool()
+
+    # set when the exact endgame solver takes over (0 to switch it off) and
+    # whether it solves the disc difference or only win/draw/loss
+    def set_endgame(self, empties, exact=True):
+        self.endgame_empties = empties
+        self.endgame_exact = exact
+
+    # set whether the root only returns the real best moves, see root_start
+    def set_exact_root(self, exact):
+        self.exact_root = exact
+
+    # switch the transposition table of the search on or off
+    def set_table(self, use_table, bits=TABLEBITS):
+        if use_table:
+            self.table = TranspositionTable(bits)
+        else:
+            self.table = None
 
-    # reset the game board and restarts
+    # reset the game board and restarts, the player moves first even if
+    # the reset came during the turn of the AI
     def reset_game(self):
         self.clean_grid()
         self.end_game = False
+        self.score = 0
+        self.player = 0
 
     # reset the game board
     def clean_grid(self):
-        for i in range(10):
-            for j in range(10):
+        size = self.board.size
+        for i in range(size+2):
+            for j in range(size+2):
                 self.grid[i][j] = 0
 
-        # initial setting
-        self.grid[4][4] = 1
-        self.grid[4][5] = -1
-        self.grid[5][4] = -1
-        self.grid[5][5] = 1
+        # initial setting, the four squares at the centre
+        half = size//2
+        self.grid[half][half] = 1
+        self.grid[half][half+1] = -1
+        self.grid[half+1][half] = -1
+        self.grid[half+1][half+1] = 1
+        self.bits = list(self.grid_to_bits(self.grid))
 
     # use the given action and place on the board
     def add_move(self, action):
@@ -135,37 +954,41 @@ class Othello():
 
         return added_move
 
-    # check whether the game board is full
-    # if yes, calculate which player has the higher score
+    # check whether the game is over, when the board is full or neither
+    # player has a move, and if yes which player has the higher score
     def check_end_game(self):
         
-        # calculate the score and update the global var.
-        score = self.check_score(self.grid)
+        # calculate the score and update the global var. from the bitboards
+        black, white = self.bits
+        score = count_bits(black) - count_bits(white)
         self.score = score
 
+        full_grid = black | white == self.board.full
+        no_move = self.board.moves(black, white) == 0 and self.board.moves(white, black) == 0
+
         # for debug use
-        print("Score = {}, {}".format(score, self.check_full_grid(self.grid)))
+        logger.debug("Score = {}, {}".format(score, full_grid))
 
         # end game by one player wins and no more move
-        if self.check_full_grid(self.grid):
+        if full_grid or no_move:
             self.end_game = True
             if score > 0:
                 self.winner = 0
                 self.result[0] += 1
-                print("Player 1 wins!")
+                logger.info("Player 1 wins!")
             elif score < 0:
                 self.winner = 1
                 self.result[1] += 1
-                print("Player 2 wins!")
+                logger.info("Player 2 wins!")
             else:
                 self.result[2] += 1
-                print("Game Draw")
+                logger.info("Game Draw")
 
     # check if the board is already fully placed
     def check_full_grid(self, grid):
         is_full_grid = True
-        for i in range(1,9,1):
-            for j in range(1,9,1):
+        for i in range(1,self.board.size+1,1):
+            for j in range(1,self.board.size+1,1):
                 if grid[i][j] == 0:
                     is_full_grid = False
                     break
@@ -174,37 +997,129 @@ class Othello():
     # do one full step for the AI player
     def player_step(self):
 
+        # the AI has no move and passes. The moves of play_action pass by
+        # themselves, but the board may have been set by overwrite_grid
+        if self.player_moves() == 0:
+            logger.debug("Player {} has no move and passes.".format(self.player))
+            self.switch_player()
+            return
+
         # the AI player build a decision tree from the current board
         # then choose the best move, then sends the decision to the 
         # grid and update the board. (Need to overwrite the original one)
         action = self.decision_tree()
-        new_grid = self.update_grid(self.grid, self.player, action)
-        self.overwrite_grid(new_grid)
+        self.play_action(action)
+
+    # add the chosen move of the player to move to the board, then check
+    # the end game and switch the player
+    def play_action(self, action):
 
-        # check if the AI's move is already the end game
-        is_end_game = self.check_end_game()
+        if self.player == 0:
+            host = 1
+        else:
+            host = -1
+
+        # only the new chess and the flipped ones change on the grid
+        me = self.bits[self.player]
+        opp = self.bits[1-self.player]
+        square = self.board.to_square(action)
+        flips = self.board.flips(me, opp, square)
+        self.bits[self.player] = me | flips | (1 << square)
+        self.bits[1-self.player] = opp & ~flips
+
+        i, j = action
+        self.grid[i][j] = host
+        while flips:
+            flip = flips & -flips
+            flips ^= flip
+            i2, j2 = self.board.to_action(flip.bit_length() - 1)
+            self.grid[i2][j2] = host
+
+        # check if the move is already the end game
+        self.check_end_game()
 
         # for debug use
-        print("Player {} added move {}.".format(self.player, action))
+        logger.debug("Player {} added move {}.".format(self.player, action))
 
         # switch player
         self.switch_player()
 
+        # a player without a move passes, the other player must have one
+        # as the game is not over
+        if self.end_game == False and self.player_moves() == 0:
+            logger.debug("Player {} has no move and passes.".format(self.player))
+            self.switch_player()
+
+    # the legal moves of the player to move as a bitboard
+    def player_moves(self):
+        return self.board.moves(self.bits[self.player], self.bits[1-self.player])
+
     # copy the new grid to the global grid variables
     def overwrite_grid(self, grid):
-        for i in range(10):
-            for j in range(10):
+        for i in range(self.board.size+2):
+            for j in range(self.board.size+2):
                 self.grid[i][j] = grid[i][j]
+        self.bits = list(self.grid_to_bits(self.grid))
 
-    # build the decision tree by the Tree class
+    # choose the move of the AI by the alpha-beta search, one of the
+    # best moves is chosen by random. None if there is no move or the
+    # search was cancelled
     def decision_tree(self):
 
-        # copy global variable for local variable to avoid overwrite
+        black, white = self.bits
+
+        # the book moves need no search at all
+        actions = self.book_actions(black, white, self.player)
+        if actions == []:
+            actions = self.iterative_deepening(black, white, self.player)
+
+        if actions == []:
+            return None
+
+        # only one move is chosen by random
+        return choice(actions)
+
+    # the best moves of the position from the opening book. The book is only
+    # for the default board size, and only used if the search would not stop
+    # at a lower depth than the book's
+    def book_actions(self, black, white, player):
+
+        self.book_hit = False
+        if self.book is None or self.board.size != BOARDSIZE:
+            return []
+        if self.time_limit is None and self.decision_level < self.book.depth:
+            return []
+
+        start = time.perf_counter()
+        records = self.book.probe(self.board.hash(black, white, player))
+        if records == []:
+            return []
+
+        self.book_hit = True
+        self.nodes = 0
+        self.search_depth = self.book.depth
+        self.search_time = time.perf_counter() - start
+
+        return sorted(self.board.to_action(record[1]) for record in records)
+
+    # build the decision tree by the Tree class and get the best move(s),
+    # the full tree is kept for debug use and for comparison with the search
+    def tree_actions(self):
+
+        # copy global variable for local variable to avoid overwrite,
+        # the tree works on the bitboards of the two players
         player = self.player
-        curr_grid = [[self.grid[j][i] for i in range(10)] for j in range(10)]
+        curr_grid = tuple(self.bits)
+
+        # the player passes, there is no move to choose from
+        if self.player_moves() == 0:
+            self.nodes = 0
+            return []
 
-        # every step a new tree is built 
+        # every step a new tree is built, the nodes are counted
+        # for comparison with the search
         tree = Tree(curr_grid, player, None, 0)
+        self.nodes = 0
 
         # generate decision tree and get the best move(s)
         tree = self.extend_tree(tree, player, 0)
@@ -213,8 +1128,566 @@ class Othello():
 
         #tree.print_tree(0)
 
-        # only one move is chosen by random
-        return choice(actions)
+        return actions
+
+    # deepen the search one ply at a time until the maximum depth or the
+    # time limit is reached, and keep the best moves of the last complete depth
+    def iterative_deepening(self, black, white, player):
+
+        self.nodes = 0
+        self.search_depth = 0
+        self.deadline = None
+        self.new_search()
+
+        actions = []
+        start = time.perf_counter()
+        position = Position(black, white, player, self.board)
+        empties = count_bits(self.board.full & ~(black | white))
+
+        # near the end of the game the exact solver replaces the deeper
+        # depths. Without a time limit it is only used if the search would
+        # reach the end of the game anyway
+        self.endgame = False
+        self.endgame_time = 0.0
+        self.endgame_nodes = 0
+        if self.time_limit is None:
+            use_endgame = empties <= min(self.endgame_empties, self.decision_level)
+        else:
+            use_endgame = empties <= self.endgame_empties
+
+        if use_endgame and self.time_limit is None:
+            max_depth = 0
+        elif use_endgame or self.time_limit is None:
+            max_depth = self.decision_level
+        else:
+            max_depth = MAXDEPTH
+
+        for depth in range(1, max_depth+1):
+
+            # the depths up to the decision level are always completed
+            if self.time_limit is not None and depth > self.decision_level:
+                self.deadline = start + self.time_limit
+
+            # the best move of the last depth is searched first
+            if actions != []:
+                hint = self.board.to_square(actions[0])
+            else:
+                hint = -1
+
+            try:
+                if self.workers > 1:
+                    score, actions = self.search_root_parallel(position, depth)
+                else:
+                    score, actions = self.search_root(position, depth, hint)
+            except SearchTimeout:
+                if self.cancel.is_set():
+                    actions = []
+                break
+
+            self.search_depth = depth
+            self.search_score = score
+
+            # no need to go deeper if the whole game is already searched
+            if depth >= empties:
+                break
+
+        # solve the end of the game in the time left, the moves of the
+        # midgame search are kept if the time runs out
+        if use_endgame and not self.cancel.is_set():
+
+            if self.time_limit is not None:
+                self.deadline = start + self.time_limit
+
+            endgame_start = time.perf_counter()
+            nodes = self.nodes
+            try:
+                score, actions = self.solve_endgame(position)
+                self.endgame = True
+                self.search_depth = empties
+                self.search_score = score
+            except SearchTimeout:
+                if self.cancel.is_set():
+                    actions = []
+
+            self.endgame_time = time.perf_counter() - endgame_start
+            self.endgame_nodes = self.nodes - nodes
+
+        self.deadline = None
+        self.search_time = time.perf_counter() - start
+
+        return actions
+
+    # start the search of a new root position
+    def new_search(self):
+
+        self.search_id += 1
+
+        if self.table is not None:
+            self.table.new_search()
+
+        # the killer moves are only good for the current position, the
+        # history is kept but with less weight than the new cutoffs
+        for killer in self.killers:
+            killer[0] = -1
+            killer[1] = -1
+        for history in self.history:
+            for square in range(len(history)):
+                history[square] //= 2
+
+    # number of nodes and speed of the last search for measuring the search
+    def search_report(self):
+
+        report = {
+            "nodes": self.nodes,
+            "depth": self.search_depth,
+            "time": self.search_time,
+            "book": self.book_hit,
+            "endgame": self.endgame,
+            "endgame_time": self.endgame_time,
+            "endgame_nodes": self.endgame_nodes,
+            "nodes_per_second": self.nodes / self.search_time if self.search_time > 0 else 0.0,
+        }
+        if self.table is not None:
+            report["table"] = self.table.stats()
+
+        return report
+
+    # the squares of the moves bitboard in the order they are searched. The
+    # hint (the best move from the table) goes first, then the killer moves
+    # of this ply, then the moves by their history and square weight
+    def order_moves(self, moves, player, ply, hint):
+
+        squares = []
+        while moves:
+            move = moves & -moves
+            moves ^= move
+            squares.append(move.bit_length() - 1)
+
+        if not self.move_ordering or len(squares) < 2:
+            return squares
+
+        killer = self.killers[ply]
+        history = self.history[player]
+        weights = self.board.weights
+
+        ordered = []
+        for square in squares:
+            if square == hint:
+                value = HINTBONUS
+            elif square == killer[0]:
+                value = KILLERBONUS + 1
+            elif square == killer[1]:
+                value = KILLERBONUS
+            else:
+                value = history[square] + weights[square]
+            ordered.append((value, square))
+        ordered.sort(reverse=True)
+
+        return [square for value, square in ordered]
+
+    # remember the move which cut off the search at this ply
+    def add_cutoff(self, player, ply, depth, square):
+
+        killer = self.killers[ply]
+        if killer[0] != square:
+            killer[1] = killer[0]
+            killer[0] = square
+
+        self.history[player][square] += depth*depth
+
+    # the score the root starts from. Same as the Tree, the net chess count
+    # starts from 0 and all moves are returned if none of them reaches it.
+    # The scores of an evaluator are on another scale, so its root starts
+    # from the worst score and the real best moves are always returned, as
+    # they are with the net chess count if exact_root is set
+    def root_start(self, player):
+        if self.evaluator is None and not self.exact_root:
+            return 0
+        return -SCOREBOUND if player == 0 else SCOREBOUND
+
+    # search all the moves at the root and return the root score with all the
+    # moves which reach it, the root starts from root_start
+    def search_root(self, position, depth, hint=-1):
+
+        player = position.player
+        self.root_depth = depth
+        squares = self.order_moves(position.moves(), player, 0, hint)
+        best = self.root_start(player)
+        actions = []
+        all_actions = []
+
+        for square in squares:
+
+            action = self.board.to_action(square)
+            all_actions.append(action)
+
+            # the window is one point wider than the best score, so that
+            # moves with an equal score are searched exactly as well. After
+            # a timeout the position is left half way and is thrown away
+            position.make_move(square)
+            if player == 0:
+                score = self.alpha_beta(position, depth-1, best-1, SCOREBOUND)
+            else:
+                score = self.alpha_beta(position, depth-1, -SCOREBOUND, best+1)
+            position.unmake_move()
+
+            if player == 0 and score > best or player == 1 and score < best:
+                best = score
+                actions = [action]
+            elif score == best:
+                actions.append(action)
+
+        # random sample if no action taken by MinMax
+        if actions == []:
+            actions = all_actions
+
+        # the order does not depend on the move ordering
+        actions.sort()
+
+        return best, actions
+
+    # split the root moves among the worker processes. Each move is searched
+    # with the full window so its exact score is known, then the best moves
+    # are chosen the same way as search_root, which gives the same result
+    def search_root_parallel(self, position, depth):
+
+        # the workers are spawned rather than forked, as the search may run
+        # on a thread of the app and a fork only copies the calling thread
+        if self.pool is None:
+            self.pool = multiprocessing.get_context("spawn").Pool(self.workers)
+
+        # the workers get the time left, not the clock of this process
+        if self.deadline is not None:
+            time_left = self.deadline - time.perf_counter()
+        else:
+            time_left = None
+
+        black, white = position.bits
+        player = position.player
+        squares = self.order_moves(position.moves(), player, 0, -1)
+        tasks = [(self.search_id, self.table is not None, self.move_ordering, self.board.size, self.evaluator,
+            black, white, player, square, depth, time_left) for square in squares]
+
+        # wait for the workers but stop them if the search is cancelled
+        result = self.pool.map_async(search_move_task, tasks, chunksize=1)
+        while not result.ready():
+            result.wait(POLLTIME)
+            if self.cancel.is_set():
+                self.close_pool()
+                raise SearchTimeout()
+        results = result.get()
+
+        best = self.root_start(player)
+        actions = []
+        all_actions = []
+
+        for square, score, nodes in results:
+
+            self.nodes += nodes
+            if score is None:
+                raise SearchTimeout()
+
+            action = self.board.to_action(square)
+            all_actions.append(action)
+
+            if player == 0 and score > best or player == 1 and score < best:
+                best = score
+                actions = [action]
+            elif score == best:
+                actions.append(action)
+
+        # random sample if no action taken by MinMax
+        if actions == []:
+            actions = all_actions
+
+        actions.sort()
+
+        return best, actions
+
+    # the exact score of one root move, used by the workers of the parallel
+    # search. The score is None if the time runs out
+    def search_move(self, black, white, player, square, depth, time_left):
+
+        self.nodes = 0
+        self.root_depth = depth
+        if time_left is not None:
+            self.deadline = time.perf_counter() + time_left
+        else:
+            self.deadline = None
+
+        position = Position(black, white, player, self.board)
+        position.make_move(square)
+
+        try:
+            score = self.alpha_beta(position, depth-1, -SCOREBOUND, SCOREBOUND)
+        except SearchTimeout:
+            score = None
+
+        self.deadline = None
+
+        return (square, score, self.nodes)
+
+    # the score of a position at the end of the search
+    def static_score(self, position):
+
+        if self.evaluator is None:
+            count = position.count
+            return count[0] - count[1]
+
+        bits = position.bits
+        return int(self.evaluator.evaluate([bits[0]], [bits[1]])[0])
+
+    # the score of a node one ply above the end of the search with its best
+    # move. The node and all its children are scored in one call of the
+    # evaluator, as the node starts from its own score as in the Tree
+    def evaluate_leaves(self, position):
+
+        player = position.player
+        bits = position.bits
+        me = bits[player]
+        opp = bits[1-player]
+
+        blacks = [bits[0]]
+        whites = [bits[1]]
+        squares = []
+
+        moves = self.board.moves(me, opp)
+        while moves:
+            move = moves & -moves
+            moves ^= move
+            square = move.bit_length() - 1
+            flips = self.board.flips(me, opp, square)
+            if player == 0:
+                blacks.append(me | move | flips)
+                whites.append(opp & ~flips)
+            else:
+                blacks.append(opp & ~flips)
+                whites.append(me | move | flips)
+            squares.append(square)
+
+        scores = self.evaluator.evaluate(blacks, whites).tolist()
+        self.nodes += len(squares)
+
+        score = scores[0]
+        best = -1
+        for square, child in zip(squares, scores[1:]):
+            if player == 0 and child > score or player == 1 and child < score:
+                score = child
+                best = square
+
+        return score, best
+
+    # solve the position to the end of the game and return the final score
+    # (net number of chess of player 0) with all the moves which reach it.
+    # In the win/draw/loss mode the score is only its sign
+    def solve_endgame(self, position):
+
+        player = position.player
+        me = position.bits[player]
+        opp = position.bits[1-player]
+
+        if self.endgame_exact:
+            low, high = -ENDGAMESCORE, ENDGAMESCORE
+        else:
+            low, high = -1, 1
+
+        best = -ENDGAMESCORE
+        actions = []
+
+        for square in self.order_endgame(me, opp):
+
+            flips = self.board.flips(me, opp, square)
+            new_me = me | flips | (1 << square)
+            new_opp = opp & ~flips
+
+            # a move which cannot reach the best score fails low, so that the
+            # moves with an equal score are found exactly as in search_root
+            alpha = max(best-1, low)
+            score = -self.endgame_search(new_opp, new_me, -high, -alpha, False)
+            if not self.endgame_exact:
+                score = max(-1, min(1, score))
+
+            if score > best:
+                best = score
+                actions = [self.board.to_action(square)]
+            elif score == best:
+                actions.append(self.board.to_action(square))
+
+        actions.sort()
+
+        # the score of the side to move to the score of player 0
+        if player == 1:
+            best = -best
+
+        return best, actions
+
+    # negamax alpha-beta search to the end of the game, the score is the
+    # net number of chess of "me" at the end. A player without a move passes,
+    # and the game ends when both players have passed
+    def endgame_search(self, me, opp, alpha, beta, passed):
+
+        self.nodes += 1
+        self.until_check -= 1
+        if self.until_check == 0:
+            self.until_check = TIMECHECK
+            if self.cancel.is_set() or self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+
+        squares = self.order_endgame(me, opp)
+        if squares == []:
+            if passed:
+                return count_bits(me) - count_bits(opp)
+            return -self.endgame_search(opp, me, -beta, -alpha, True)
+
+        best = -ENDGAMESCORE
+        for square in squares:
+
+            flips = self.board.flips(me, opp, square)
+            score = -self.endgame_search(opp & ~flips, me | flips | (1 << square), -beta, -alpha, False)
+
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best
+
+    # the moves of the endgame in search order. With many empty squares the
+    # move which leaves the opponent the fewest replies goes first (fastest
+    # first), with few empty squares the moves in the regions with an odd
+    # number of empty squares go first (parity)
+    def order_endgame(self, me, opp):
+
+        board = self.board
+        moves = board.moves(me, opp)
+        squares = []
+        while moves:
+            move = moves & -moves
+            moves ^= move
+            squares.append(move.bit_length() - 1)
+
+        if len(squares) < 2:
+            return squares
+
+        empty = board.full & ~(me | opp)
+        if count_bits(empty) > PARITYEMPTIES:
+            ordered = []
+            for square in squares:
+                flips = board.flips(me, opp, square)
+                new_opp = opp & ~flips
+                replies = count_bits(board.moves(new_opp, me | flips | (1 << square)))
+                ordered.append((replies, -board.weights[square], square))
+        else:
+            odd = 0
+            for quadrant in board.quadrants:
+                if count_bits(empty & quadrant) % 2 == 1:
+                    odd |= quadrant
+            ordered = [(0 if (1 << square) & odd else 1, -board.weights[square], square) for square in squares]
+
+        ordered.sort()
+
+        return [item[2] for item in ordered]
+
+    # depth-first alpha-beta search without storing the tree, the moves are
+    # made and taken back on the position in place. The score is the net
+    # number of chess of player 0, which player 0 maximizes and player 1
+    # minimizes. Same as the Tree, every node starts from its own score
+    def alpha_beta(self, position, depth, alpha, beta):
+
+        self.nodes += 1
+        self.until_check -= 1
+        if self.until_check == 0:
+            self.until_check = TIMECHECK
+            if self.cancel.is_set() or self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+
+        if depth == 0:
+            return self.static_score(position)
+
+        # a stored score is only used for the same depth, so that the
+        # search gives the same moves as without the table. The best move
+        # of the entry is still a good first guess at any depth
+        table = self.table
+        key = position.key
+        hint = -1
+        if table is not None:
+            entry = table.probe(key)
+            if entry is not None:
+                if entry[1] == depth:
+                    flag = entry[2]
+                    if flag == EXACT or (flag == LOWER and entry[3] >= beta) or (flag == UPPER and entry[3] <= alpha):
+                        table.cutoffs += 1
+                        return entry[3]
+                hint = entry[4]
+
+        player = position.player
+        alpha_start = alpha
+        beta_start = beta
+        ply = self.root_depth - depth
+
+        if depth == 1 and self.evaluator is not None:
+            score, best = self.evaluate_leaves(position)
+            squares = []
+        else:
+            score = self.static_score(position)
+            best = -1
+            bits = position.bits
+            squares = self.order_moves(self.board.moves(bits[player], bits[1-player]), player, ply, hint)
+
+            # a player without a move passes, and the game is over if the
+            # other player has no move either
+            if squares == []:
+                if self.board.moves(bits[1-player], bits[player]) == 0:
+                    return score
+                squares = [PASS]
+
+        for square in squares:
+
+            # player 0 takes the maximum and player 1 the minimum,
+            # stop as soon as the other player would avoid this node
+            if player == 0:
+                if score >= beta:
+                    break
+                alpha = max(alpha, score)
+            else:
+                if score <= alpha:
+                    break
+                beta = min(beta, score)
+
+            if square == PASS:
+                position.make_pass()
+            else:
+                position.make_move(square)
+            child = self.alpha_beta(position, depth-1, alpha, beta)
+            position.unmake_move()
+
+            if player == 0:
+                if child > score:
+                    score = child
+                    best = square
+            else:
+                if child < score:
+                    score = child
+                    best = square
+
+        # a score outside the window is only a bound of the exact score
+        if score <= alpha_start:
+            flag = UPPER
+        elif score >= beta_start:
+            flag = LOWER
+        else:
+            flag = EXACT
+
+        # the move which made the other player avoid this node is a cutoff
+        if best >= 0 and (flag == LOWER and player == 0 or flag == UPPER and player == 1):
+            self.add_cutoff(player, ply, depth, best)
+
+        if table is not None:
+            table.store(key, depth, flag, score, best)
+
+        return score
 
     # from the current configuration, build the extension of the tree by listing
     # all possible configurations of the next steps
@@ -224,138 +1697,127 @@ class Othello():
         if level == self.decision_level: return tree
         level += 1
 
+        # player 0 owns the first bitboard and player 1 the second one
+        black, white = tree.grid
+        if curr_player == 0:
+            me, opp = black, white
+        else:
+            me, opp = white, black
+
         # get all the valid moves on the grid
         # i.e. the step will eat at least one opponent player's chess
-        valid_actions = self.get_valid_actions(tree.grid, curr_player)
+        moves = self.board.moves(me, opp)
+
+        # without a move the player passes, the board is the same for the
+        # other player. The game is over if the other player cannot move
+        if moves == 0 and self.board.moves(opp, me) != 0:
+            child = Tree(tree.grid, (curr_player+1)%2, None, tree.score)
+            self.nodes += 1
+            child = self.extend_tree(child, (curr_player+1)%2, level)
+            tree.add_child(child)
 
-        for action in valid_actions:
+        while moves:
             
-            # simplify the notation
-            i, j = action
-
-            # build the next step
-            player = curr_player
-
-            # copy the local board and add one extra step
-            if player == 0:
-                new_grid = [[tree.grid[j][i] for i in range(10)] for j in range(10)]
-                new_grid[i][j] = 1
+            # take the lowest move first so that the order is the same as
+            # scanning the grid row by row
+            move = moves & -moves
+            moves ^= move
+            square = move.bit_length() - 1
+
+            # add the move and flip the chess accordingly
+            flips = self.board.flips(me, opp, square)
+            new_me = me | move | flips
+            new_opp = opp & ~flips
+
+            if curr_player == 0:
+                new_grid = (new_me, new_opp)
             else:
-                new_grid = [[tree.grid[j][i] for i in range(10)] for j in range(10)]
-                new_grid[i][j] = -1
-                    
-            # update the board to flip the chess accordingly and then calculate score
-            new_grid = self.update_grid(new_grid, player, action)
-            score = self.check_score(new_grid)
+                new_grid = (new_opp, new_me)
 
-            # set a child node based on the new_grid
-            child = Tree(new_grid, (player+1)%2, action, score)
+            # the score is the net number of chess of player 0
+            score = count_bits(new_grid[0]) - count_bits(new_grid[1])
 
-            # for debug use
-            if child.score != 0:    
-                print("Going to extend tree {} {} {}".format(new_grid, action, level))
+            # set a child node based on the new_grid
+            child = Tree(new_grid, (curr_player+1)%2, self.board.to_action(square), score)
+            self.nodes += 1
 
             # extend the tree by the child node using depth-first search
-            child = self.extend_tree(child, (player+1)%2, level)
+            child = self.extend_tree(child, (curr_player+1)%2, level)
 
             # add the fully developed child as one child of the parent node
             tree.add_child(child)
                 
         return tree
 
+    # convert the padded grid to the bitboards of player 0 and player 1
+    def grid_to_bits(self, grid):
+
+        black = 0
+        white = 0
+        for i in range(1,self.board.size+1,1):
+            for j in range(1,self.board.size+1,1):
+                if grid[i][j] == 1:
+                    black |= 1 << self.board.to_square((i,j))
+                elif grid[i][j] == -1:
+                    white |= 1 << self.board.to_square((i,j))
+
+        return (black, white)
+
+    # the bitboards of the side to move and of its opponent
+    def player_bits(self, grid, player):
+
+        black, white = self.grid_to_bits(grid)
+        if player == 0:
+            return black, white
+        return white, black
+
     # check if the action is valid for a given grid and the player turn
     def is_valid_action(self, grid, player, action):
 
         i, j = action 
 
+        # the move must be on an empty square of the board
+        size = self.board.size
+        if i < 1 or i > size or j < 1 or j > size or grid[i][j] != 0:
+            return False
+
         if player == 0:
             host = 1
-            opp = -1
         else:
             host = -1
-            opp = 1
 
-        has_action = False
+        # and it must flip at least one of the opponent's chess. Each ray
+        # stops at the first square which is not the opponent's
+        for ray in self.board.rays[self.board.to_square(action)]:
+            i2, j2 = ray[0]
+            if grid[i2][j2] != -host:
+                continue
+            for i2, j2 in ray[1:]:
+                if grid[i2][j2] != -host:
+                    if grid[i2][j2] == host:
+                        return True
+                    break
 
-        # span all the eight directions
-        if grid[i][j] == 0:
-                    
-            # down direction
-            if grid[i+1][j] == opp:
-                for i2 in range(i+1,10,1):
-                    if grid[i2][j] == host: 
-                        has_action = True
-
-            # up direction
-            if grid[i-1][j] == opp:
-                for i2 in range(i-1):
-                    if grid[i2][j] == host: 
-                        has_action = True
-
-            # right direction
-            if grid[i][j+1] == opp:
-                i2min = 10 - j
-                for i2 in range(i2min):
-                    if grid[i][j+i2] == host: 
-                        has_action = True
-
-            # left direction
-            if grid[i][j-1] == opp:
-                i2min = j
-                for i2 in range(i2min):
-                    if grid[i][j-i2] == host: 
-                        has_action = True
-
-
-            # up-left direction
-            if grid[i-1][j-1] == opp:
-                i2min = min(i-1,j-1)
-                for i2 in range(i2min):
-                    if grid[i-i2][j-i2] == host: 
-                        has_action = True
-
-            # up-right direction
-            if grid[i-1][j+1] == opp:
-                i2min = min(i-1, 10-j)
-                for i2 in range(i2min):
-                    if grid[i-i2][j+i2] == host: 
-                        has_action = True
-
-            # down-right direction
-            if grid[i+1][j+1] == opp:
-                i2min = min(10-i, 10-j)
-                for i2 in range(i2min):
-                    if grid[i+i2][j+i2] == host: 
-                        has_action = True
-
-            # down-left direction
-            if grid[i+1][j-1] == opp:
-                i2min = min(10-i, j-1)
-                for i2 in range(i2min):
-                    if grid[i+i2][j-i2] == host: 
-                        has_action = True
-
-        return has_action
-
-    # for the given grid and player turn, determines all the possible moves
+        return False
+
+    # for the given grid and player turn, determines all the possible moves.
+    # The board of the game has its bitboards already, other grids are read
     def get_valid_actions(self, grid, player):
 
-        moves = []
-        if player == 0:
-            host = 1
-            opp = -1
+        if grid is self.grid:
+            me, opp = self.bits[player], self.bits[1-player]
         else:
-            host = -1
-            opp = 1
+            me, opp = self.player_bits(grid, player)
+        moves = self.board.moves(me, opp)
 
-        # if the move is valid, add to the candidate list
-        for i in range(1,9,1):
-            for j in range(1,9,1):
-                has_action = self.is_valid_action(grid, player, (i,j))
-                if has_action == True:
-                    moves.append((i,j))
+        # the bits are in the row by row order of the grid
+        actions = []
+        while moves:
+            move = moves & -moves
+            moves ^= move
+            actions.append(self.board.to_action(move.bit_length() - 1))
 
-        return moves
+        return actions
 
     # for a given grid and player turn, use the action to update the grid
     # and then flip the chess accordingly
@@ -363,94 +1825,24 @@ class Othello():
 
         if player == 0:
             host = 1
-            opp = -1
         else:
             host = -1
-            opp = 1
-
-        i, j = action
 
         # add the move 
+        i, j = action
         grid[i][j] = host
-        print("in update grid", grid)
-
-        # then do all the 8 direction search to check if chesses needed to be flipped
-        # down direction
-        if grid[i+1][j] == opp:
-            i2min = 10 - i
-            for i2 in range(1,i2min):
-                if grid[i+i2][j] == host: 
-                    print("reversing down direction")
-                    for j2 in range(i2):
-                        grid[i+j2][j] = host        
-                    break
-
-        # up direction
-        if grid[i-1][j] == opp:
-            i2min = i
-            for i2 in range(1,i2min):
-                if grid[i-i2][j] == host: 
-                    print("reversing up direction")
-                    for j2 in range(i2):
-                        grid[i-j2][j] = host        
-                    break
-
-
-        # right direction
-        if grid[i][j+1] == opp:
-            i2min = 10 - j
-            for i2 in range(1,i2min):
-                if grid[i][j+i2] == host: 
-                    print("reversing right direction")
-                    for j2 in range(i2):
-                        grid[i][j+j2] = host        
-                    break
-
-        # left direction
-        if grid[i][j-1] == opp:
-            i2min = j
-            for i2 in range(1,i2min):
-                if grid[i][j-i2] == host: 
-                    print("reversing left direction")
-                    for j2 in range(i2):
-                        grid[i][j-j2] = host        
-                    break
-
-        # down right direction
-        if grid[i+1][j+1] == opp:
-            i2min = min(10-i, 10-j)
-            for i2 in range(1,i2min):
-                if grid[i+i2][j+i2] == host: 
-                    for j2 in range(i2):
-                        grid[i+j2][j+j2] = host        
-                    break
-        
-        # down left direction
-        if grid[i+1][j-1] == opp:
-            i2min = min(10-i, j)
-            for i2 in range(1,i2min):
-                if grid[i+i2][j-i2] == host: 
-                    for j2 in range(i2):
-                        grid[i+j2][j-j2] = host        
-                    break
 
-        # up right direction
-        if grid[i-1][j+1] == opp:
-            i2min = min(i, 10-j)
-            for i2 in range(1,i2min):
-                if grid[i-i2][j+i2] == host: 
-                    for j2 in range(i2):
-                        grid[i-j2][j+j2] = host        
-                    break
-
-        # up left direction
-        if grid[i-1][j-1] == opp:
-            i2min = min(10-i, 10-j)
-            for i2 in range(1,i2min):
-                if grid[i-i2][j-i2] == host: 
-                    for j2 in range(i2):
-                        grid[i-j2][j-j2] = host        
+        # then flip all the chess found by the 8 direction search, a line
+        # of the opponent's chess flips if our chess closes it
+        for ray in self.board.rays[self.board.to_square(action)]:
+            line = []
+            for i2, j2 in ray:
+                if grid[i2][j2] != -host:
                     break
+                line.append((i2, j2))
+            if line != [] and grid[i2][j2] == host:
+                for i3, j3 in line:
+                    grid[i3][j3] = host
 
         return grid
 
@@ -461,8 +1853,8 @@ class Othello():
 
         score = 0
         # horizontal
-        for i in range(10):
-            for j in range(10):
+        for i in range(self.board.size+2):
+            for j in range(self.board.size+2):
                 score += grid[i][j]
         return score
 
@@ -473,7 +1865,7 @@ class Tree():
 
     def __init__(self, grid, player, action, score):
 
-        # the game board
+        # the game board, as the bitboards of player 0 and player 1
         self.grid = grid
 
         # the player turn for the next move
@@ -528,16 +1920,17 @@ class Tree():
             if child.score == self.score:
                 action.append(child.action)
 
-        # random sample if no action taken by MinMax
-        if action == []:
+        # random sample if no action taken by MinMax, there is no
+        # action at all if the player has to pass
+        if action == [] and self.children != []:
             action.append(choice(self.children).action)
 
         return action
 
     # for debug use
     def print_tree(self, level):
-        print("At level {}".format(level))
-        print("grid={}, player={}, action={}, score={}".format(self.grid, self.player, self.action, self.score))
+        logger.debug("At level {}".format(level))
+        logger.debug("grid={}, player={}, action={}, score={}".format(self.grid, self.player, self.action, self.score))
         for child in self.children:
             child.print_tree(level+1)
 
@@ -545,10 +1938,20 @@ class Tree():
 # calls the backend for its background logic.
 class OthelloApp():
 
-    def __init__(self):
+    def __init__(self, size=BOARDSIZE):
 
         pygame.init()
 
+        # the tiles follow the board size so that the board fits the window,
+        # the chess images are scaled to the tiles
+        self.size = size
+        if size == BOARDSIZE:
+            self.tile_size = TILESIZE
+        else:
+            self.tile_size = GRIDSIZE // size
+        self.grid_size = self.tile_size*size
+        self.chess_size = (self.tile_size - 2*MARGINSIZE, self.tile_size - 2*MARGINSIZE)
+
         # set up configuration parameters 
         self.fps_clock = pygame.time.Clock()
         self.display_surf = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
@@ -560,10 +1963,27 @@ class OthelloApp():
 
         # meta-data for decoration
         pygame.display.set_caption("Othello")
-        pygame.display.set_icon(pygame.image.load("othello_black.png"))
+        self.images = {}
+        pygame.display.set_icon(self.get_image("black"))
+
+        # call the backend app, the AI uses all but one core for the search
+        self.othello = Othello(size=size)
+        self.othello.set_workers(WORKERS)
 
-        # call the backend app
-        self.othello = Othello()
+        # the opening book is optional, see othello_book.py
+        if os.path.exists(BOOKFILE):
+            self.othello.set_book(BOOKFILE)
+
+        # so are the fitted weights of the evaluation, see othello_fit.py,
+        # both are made for the default board size
+        if size == BOARDSIZE and os.path.exists(WEIGHTSFILE):
+            self.othello.set_evaluator(BatchEvaluator.load(WEIGHTSFILE))
+
+        # the AI searches on a background thread and puts its move in the
+        # queue, the move is only played after a short wait for the player
+        self.search_thread = None
+        self.search_queue = queue.Queue()
+        self.ai_ready_time = 0
 
         while True:
 
@@ -575,6 +1995,8 @@ class OthelloApp():
             # check the keyboard and mouse input
             for event in pygame.event.get():
                 if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
+                    self.stop_ai_search()
+                    self.othello.close_pool()
                     pygame.quit()
                     sys.exit()
                 elif event.type == MOUSEBUTTONDOWN:
@@ -584,21 +2006,62 @@ class OthelloApp():
             # the AI player waits for the other player to finish 
             # and add its move if the game is ongoing
             if self.othello.end_game == False and self.othello.player == 1:
-                pygame.time.wait(1000)
-                self.othello.player_step()
+                self.poll_ai_search()
 
             # put all the screen data online
             pygame.display.update()
             self.fps_clock.tick(FPS)
 
+    # start the AI search if it is not running, and play its move once
+    # the search is done. The screen keeps updating in the meantime
+    def poll_ai_search(self):
+
+        if self.search_thread is None:
+            self.othello.clear_cancel()
+            self.ai_ready_time = pygame.time.get_ticks() + AIWAIT
+            self.search_thread = threading.Thread(target=self.run_ai_search, daemon=True)
+            self.search_thread.start()
+            return
+
+        if self.search_thread.is_alive() or pygame.time.get_ticks() < self.ai_ready_time:
+            return
+
+        self.search_thread = None
+        action = self.search_queue.get()
+
+        # the AI has no move, the turn goes back to the player. The moves
+        # pass by themselves, so this is only a safeguard
+        if action is None:
+            self.othello.switch_player()
+        else:
+            self.othello.play_action(action)
+
+    # the work of the background thread
+    def run_ai_search(self):
+        self.search_queue.put(self.othello.decision_tree())
+
+    # cancel the AI search and throw away its move, the search is started
+    # again in the next frame if it is still the AI's turn
+    def stop_ai_search(self):
+
+        if self.search_thread is None:
+            return
+
+        self.othello.cancel_search()
+        self.search_thread.join()
+        self.search_thread = None
+
+        while not self.search_queue.empty():
+            self.search_queue.get()
+
     # check where the mouse clicked and acts accordingly to it
     def handle_mouse_click(self, mousex, mousey):
 
         # the mouse clicked the game board
-        if mousey < GRIDSIZE:
-            if mousex<GRIDSIZE:
-                clicked_grid_i = int(mousex / TILESIZE) + 1
-                clicked_grid_j = int(mousey / TILESIZE) + 1
+        if mousey < self.grid_size:
+            if mousex<self.grid_size:
+                clicked_grid_i = int(mousex / self.tile_size) + 1
+                clicked_grid_j = int(mousey / self.tile_size) + 1
 
                 # first check the player's move is valid
                 is_valid_action = self.othello.is_valid_action(
@@ -606,37 +2069,40 @@ class OthelloApp():
                 )
 
                 # for debug use
-                print("Player attempt move {} {}, valid? {}".format(clicked_grid_j, clicked_grid_i, is_valid_action))
-
-                # if yes, then update the board according to the move
-                if self.othello.end_game == False and is_valid_action == True:
-                    print("Player add move {} {}".format(clicked_grid_j, clicked_grid_i))
-                    self.othello.update_grid(self.othello.grid, self.othello.player, (clicked_grid_j, clicked_grid_i))
-                    self.othello.check_end_game()
+                logger.debug("Player attempt move {} {}, valid? {}".format(clicked_grid_j, clicked_grid_i, is_valid_action))
 
-                    # switch the current player so that it becomes the other player's (AI) turn
-                    self.othello.switch_player()
+                # if yes, then update the board according to the move,
+                # the board is locked while the AI is thinking
+                if self.othello.end_game == False and self.othello.player == 0 and is_valid_action == True:
+                    logger.debug("Player add move {} {}".format(clicked_grid_j, clicked_grid_i))
+                    # the move switches the current player so that it becomes the
+                    # other player's (AI) turn, unless the AI has to pass
+                    self.othello.play_action((clicked_grid_j, clicked_grid_i))
 
         # the mouse clicked one of the button
         elif mousey>GRIDSIZE and mousey<GRIDSIZE + BUTTONSIZE[1]:
 
             # EASY buttonn
             if mousex < BUTTONSIZE[0]:
-                self.othello.set_decision_level(1)
-                print("Difficult set to 1")
+                self.stop_ai_search()
+                self.othello.set_decision_level(*EASYLEVEL)
+                logger.debug("Difficult set to {}".format(EASYLEVEL))
 
             # MEDIUM button
             elif mousex > BUTTONSIZE[0] and mousex < 2*BUTTONSIZE[0]: 
-                self.othello.set_decision_level(3)
-                print("Difficult set to 3")
+                self.stop_ai_search()
+                self.othello.set_decision_level(*MEDIUMLEVEL)
+                logger.debug("Difficult set to {}".format(MEDIUMLEVEL))
 
             # HARD button
             elif mousex > 2*BUTTONSIZE[0] and mousex < 3*BUTTONSIZE[0]: 
-                self.othello.set_decision_level(5)
-                print("Difficult set to 5")
+                self.stop_ai_search()
+                self.othello.set_decision_level(*HARDLEVEL)
+                logger.debug("Difficult set to {}".format(HARDLEVEL))
 
             # RESET button
             elif mousex > 3*BUTTONSIZE[0] and mousex < 4*BUTTONSIZE[0]:
+                self.stop_ai_search()
                 self.othello.reset_game()
 
     # draw the game board according to the game board, and add all the 
@@ -645,32 +2111,39 @@ class OthelloApp():
 
         self.display_surf.fill(BGCOLOR)
 
-        # draw the game board
-        grid_rect = pygame.Rect(0, 0, GRIDSIZE, GRIDSIZE)
-        self.display_surf.blit(GRIDIMG, grid_rect)
+        # draw the game board, the grid image is for the 8x8 board and
+        # the other sizes draw their lines
+        grid_rect = pygame.Rect(0, 0, self.grid_size, self.grid_size)
+        if self.size == BOARDSIZE:
+            self.display_surf.blit(self.get_image("grid"), grid_rect)
+        else:
+            pygame.draw.rect(self.display_surf, BOARDCOLOR, grid_rect)
+            for k in range(self.size+1):
+                pygame.draw.line(self.display_surf, LINECOLOR, (k*self.tile_size, 0), (k*self.tile_size, self.grid_size))
+                pygame.draw.line(self.display_surf, LINECOLOR, (0, k*self.tile_size), (self.grid_size, k*self.tile_size))
 
         # put all the chesses on the board
-        for j in range(1,9,1):
-            for i in range(1,9,1):
+        for j in range(1,self.size+1,1):
+            for i in range(1,self.size+1,1):
                 if self.othello.grid[j][i] == 1:
-                    grid_rect = pygame.Rect(MARGINSIZE + (i-1)*TILESIZE, MARGINSIZE + (j-1)*TILESIZE, IMGSIZE[0], IMGSIZE[1])
-                    self.display_surf.blit(BLACKIMG, grid_rect)
+                    grid_rect = pygame.Rect(MARGINSIZE + (i-1)*self.tile_size, MARGINSIZE + (j-1)*self.tile_size, self.chess_size[0], self.chess_size[1])
+                    self.display_surf.blit(self.get_chess_image("black"), grid_rect)
                 elif self.othello.grid[j][i] == -1:
-                    grid_rect = pygame.Rect(MARGINSIZE + (i-1)*TILESIZE, MARGINSIZE + (j-1)*TILESIZE, IMGSIZE[0], IMGSIZE[1])
-                    self.display_surf.blit(WHITEIMG, grid_rect)
+                    grid_rect = pygame.Rect(MARGINSIZE + (i-1)*self.tile_size, MARGINSIZE + (j-1)*self.tile_size, self.chess_size[0], self.chess_size[1])
+                    self.display_surf.blit(self.get_chess_image("white"), grid_rect)
 
         # draw all buttons 
         grid_rect = pygame.Rect(10, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(EASYBTN, grid_rect)
+        self.display_surf.blit(self.get_image("easy"), grid_rect)
 
         grid_rect = pygame.Rect(110, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(MEDIUMBTN, grid_rect)
+        self.display_surf.blit(self.get_image("medium"), grid_rect)
 
         grid_rect = pygame.Rect(210, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(HARDBTN, grid_rect)
+        self.display_surf.blit(self.get_image("hard"), grid_rect)
 
         grid_rect = pygame.Rect(310, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(RESETBTN, grid_rect)
+        self.display_surf.blit(self.get_image("reset"), grid_rect)
 
         # draw the score text for GUI
         score_text = "Win: {} Lose: {} Draw: {}".format(self.othello.result[0], self.othello.result[1], self.othello.result[2])
@@ -685,7 +2158,22 @@ class OthelloApp():
 
         # chess colour
         grid_rect = pygame.Rect(335, GRIDSIZE+60, IMGSIZE[0]/2, IMGSIZE[1]/2)
-        self.display_surf.blit(BLACKIMG2, grid_rect)
+        self.display_surf.blit(self.get_image("black_small"), grid_rect)
+
+    # the image cache of the app, each image is loaded the first time it is used
+    def get_image(self, name):
+        if name not in self.images:
+            self.images[name] = pygame.image.load(IMAGEFILES[name])
+        return self.images[name]
+
+    # the chess image scaled to the tiles of the board, also cached
+    def get_chess_image(self, name):
+        if self.chess_size == IMGSIZE:
+            return self.get_image(name)
+        key = (name, self.chess_size)
+        if key not in self.images:
+            self.images[key] = pygame.transform.smoothscale(self.get_image(name), self.chess_size)
+        return self.images[key]
 
     # a method for generating sprite of the text
     def make_text(self, text, color, bgcolor, left, top):
@@ -699,7 +2187,14 @@ class OthelloApp():
 # to call the frontend.
 def main():
 
-    othello_app = OthelloApp()
+    parser = argparse.ArgumentParser(description="Othello against the AI")
+    parser.add_argument("--size", type=int, choices=BOARDSIZES, default=BOARDSIZE, help="number of rows and columns of the board")
+    args = parser.parse_args()
+
+    # show the debug output of the game on the console
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+
+    othello_app = OthelloApp(args.size)
 
     #othello = Othello()
 
@@ -0,0 +1,94 @@
+'''
+This is the offline builder of the opening book for the Othello engine in
+othello.py. It lists every position reachable in the first few moves from
+the starting position, searches each of them deeply, and writes the best
+moves to a compact binary file keyed by the Zobrist hash of the position.
+The app loads the file (othello_book.bin) at startup if it exists.
+
+Example:
+    python othello_book.py --plies 4 --depth 8 --output othello_book.bin
+'''
+
+import argparse
+import time
+
+from othello import Othello, OpeningBook, Position, BOOKFILE, action_to_square
+
+# list all the positions reachable from the starting position in the given
+# number of moves, as (black, white, player) without repeats
+def opening_positions(plies):
+
+    othello = Othello(use_table=False)
+    black, white = othello.grid_to_bits(othello.grid)
+    position = Position(black, white, 0)
+
+    found = {}
+
+    def visit(ply):
+
+        if position.key in found:
+            return
+        found[position.key] = (position.bits[0], position.bits[1], position.player)
+
+        if ply == plies:
+            return
+
+        moves = position.moves()
+        while moves:
+            move = moves & -moves
+            moves ^= move
+            position.make_move(move.bit_length() - 1)
+            visit(ply+1)
+            position.unmake_move()
+
+    visit(0)
+
+    return list(found.values())
+
+# search every opening position and collect the records of its best moves
+def build_book(plies, depth, workers=1):
+
+    othello = Othello()
+    othello.set_decision_level(depth)
+    othello.set_workers(workers)
+
+    # the book keeps only the moves of the real best score with that score,
+    # not all the moves when none of them reaches the start of the root
+    othello.set_exact_root(True)
+
+    records = []
+    positions = opening_positions(plies)
+    start = time.perf_counter()
+
+    for index, (black, white, player) in enumerate(positions):
+
+        position = Position(black, white, player)
+        if position.moves() == 0:
+            continue
+
+        # the score of the best moves is kept for information
+        actions = othello.iterative_deepening(black, white, player)
+        for action in actions:
+            records.append((position.key, action_to_square(action), othello.search_score))
+
+        print("{}/{} positions, {:.0f}s".format(index+1, len(positions), time.perf_counter() - start))
+
+    othello.close_pool()
+
+    return records
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Build the opening book of the Othello engine")
+    parser.add_argument("--plies", type=int, default=4, help="number of moves from the starting position")
+    parser.add_argument("--depth", type=int, default=8, help="search depth of every book position")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes for the search")
+    parser.add_argument("--output", default=BOOKFILE, help="book file to write")
+    args = parser.parse_args()
+
+    records = build_book(args.plies, args.depth, args.workers)
+    OpeningBook.write(args.output, records, args.depth)
+    print("Wrote {} records to {}".format(len(records), args.output))
+
+if __name__ == "__main__":
+    main()
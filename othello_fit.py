@@ -0,0 +1,102 @@
+'''
+This is the offline fitting of the evaluation weights of the Othello engine
+in othello.py. It plays headless self-play games, keeps every position with
+the final score of its game, and fits the weights of the features of the
+batch evaluator (square, mobility and frontier) to the final scores by least
+squares. The weights are saved as a NumPy array file (othello_weights.npy)
+which the app loads at startup if it exists.
+
+Example:
+    python othello_fit.py --games 500 --engine depth=2 --output othello_weights.npy
+'''
+
+import argparse
+import time
+
+import numpy as np
+
+from othello import BatchEvaluator, WEIGHTSFILE, FEATURES, FULLBOARD, count_bits
+from othello_selfplay import OthelloSelfPlay, parse_engine
+
+# the fitted weights are in chess, they are multiplied by this before they
+# are rounded to integers so that small weights are not lost
+WEIGHTSSCALE = 16
+
+# play the self-play games and return the positions with between min_empties
+# and max_empties empty squares as lists of black, white and final score
+def generate_positions(games, config, random_moves, seed, min_empties, max_empties):
+
+    self_play = OthelloSelfPlay(config, config, seed, random_moves, record=True)
+    for game in range(games):
+        self_play.play_game(game % 2)
+    for engine in self_play.engines:
+        engine.close_pool()
+
+    blacks = []
+    whites = []
+    scores = []
+    for black, white, score in self_play.positions:
+        empties = count_bits(FULLBOARD & ~(black | white))
+        if min_empties <= empties <= max_empties:
+            blacks.append(black)
+            whites.append(white)
+            scores.append(score)
+
+    return blacks, whites, scores
+
+# the least-squares weights of the features for the scores, the ridge term
+# keeps the weights of rarely used squares small
+def fit_weights(features, scores, ridge=1.0):
+
+    x = features.astype(np.float64)
+    y = np.array(scores, dtype=np.float64)
+
+    # the ridge term is the same as extra rows of sqrt(ridge) * identity
+    # with a score of 0
+    if ridge > 0:
+        x = np.vstack((x, np.sqrt(ridge) * np.eye(FEATURES)))
+        y = np.concatenate((y, np.zeros(FEATURES)))
+
+    coef = np.linalg.lstsq(x, y, rcond=None)[0]
+
+    return np.rint(coef * WEIGHTSSCALE).astype(np.int64)
+
+# root mean square error of the scores of the weights in chess
+def rms_error(features, scores, weights, scale):
+    error = features @ weights / scale - np.array(scores, dtype=np.float64)
+    return float(np.sqrt(np.mean(error * error)))
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Fit the evaluation weights of the Othello engine")
+    parser.add_argument("--games", type=int, default=200, help="number of self-play games")
+    parser.add_argument("--engine", default="depth=1", help="settings of the self-play engine, see othello_selfplay.py")
+    parser.add_argument("--random-moves", type=int, default=10, help="random moves at the start of every game")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random moves")
+    parser.add_argument("--min-empties", type=int, default=10, help="fewest empty squares of a training position")
+    parser.add_argument("--max-empties", type=int, default=50, help="most empty squares of a training position")
+    parser.add_argument("--ridge", type=float, default=1.0, help="ridge term of the least squares")
+    parser.add_argument("--output", default=WEIGHTSFILE, help="weights file to write")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    blacks, whites, scores = generate_positions(args.games, parse_engine(args.engine), args.random_moves,
+        args.seed, args.min_empties, args.max_empties)
+    print("{} positions from {} games, {:.1f}s".format(len(scores), args.games, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    evaluator = BatchEvaluator()
+    features = evaluator.features(blacks, whites)
+    weights = fit_weights(features, scores, args.ridge)
+    print("Fitted {} weights, {:.2f}s".format(FEATURES, time.perf_counter() - start))
+
+    # the disc difference is the sum of the square features
+    disc_weights = np.array([1]*(FEATURES-2) + [0, 0], dtype=np.int64)
+    print("RMS error of the final score: disc difference {:.2f}, fitted {:.2f}".format(
+        rms_error(features, scores, disc_weights, 1), rms_error(features, scores, weights, WEIGHTSSCALE)))
+
+    BatchEvaluator(weights).save(args.output)
+    print("Wrote the weights to {}".format(args.output))
+
+if __name__ == "__main__":
+    main()
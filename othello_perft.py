@@ -0,0 +1,185 @@
+'''
+This is the perft tool of the move generator of the Othello engine in
+othello.py. It counts the positions (leaves) reached after exactly N moves
+from the starting position and from a few stored test positions, times
+every depth, and checks the counts against the reference values. A pass
+counts as a move, and a finished game counts as a leaf at its own depth.
+
+The bitboard backend (Position) is what the search uses, the grid backend
+(get_valid_actions, is_valid_action and update_grid) is what the app uses.
+Both must give the same counts. The other board sizes can be counted too,
+there are no reference counts for them.
+
+Example:
+    python othello_perft.py --depth 8 --backend both
+'''
+
+import argparse
+import sys
+import time
+
+from othello import Othello, Position, BOARDSIZE, BOARDSIZES, count_bits
+
+# the leaf counts of the starting position of the 8x8 board for depth 0, 1, 2, ...
+PERFTSTART = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284, 212258800]
+
+# the stored test positions as (name, black, white, player to move, leaf
+# counts for depth 0, 1, 2, ...), picked to cover passes and the end of game.
+# The counts were checked with a plain list-grid move generator
+PERFTPOSITIONS = [
+    ("midgame", 0x0000010b17371311, 0x00051e142808284a, 0,
+        [1, 16, 111, 1543, 11189, 141653]),
+    ("pass", 0x0407163e7e3e3e7c, 0xf8f8e8c080810000, 0,
+        [1, 1, 8, 16, 120, 340, 2096, 6070, 28992, 74227, 244775]),
+    ("endgame", 0xc2c488b0a8e89809, 0x3039764f57166744, 0,
+        [1, 9, 41, 287, 768, 3996, 7969, 28522, 45066, 91018, 92760, 111980, 112311]),
+]
+
+# the leaf count of the bitboard backend, the moves are made and taken
+# back on the position in place
+def perft_bits(position, depth):
+
+    if depth == 0:
+        return 1
+
+    moves = position.moves()
+
+    # without a move the player passes, or the game is over and the
+    # position is a leaf
+    if moves == 0:
+        bits = position.bits
+        player = position.player
+        if depth == 1 or position.board.moves(bits[1-player], bits[player]) == 0:
+            return 1
+        position.make_pass()
+        count = perft_bits(position, depth-1)
+        position.unmake_move()
+        return count
+
+    # the last move need not be made to be counted
+    if depth == 1:
+        return count_bits(moves)
+
+    count = 0
+    while moves:
+        move = moves & -moves
+        moves ^= move
+        position.make_move(move.bit_length() - 1)
+        count += perft_bits(position, depth-1)
+        position.unmake_move()
+
+    return count
+
+# the leaf count of the grid backend on copies of the grid. With check, the
+# moves of get_valid_actions are compared to is_valid_action on every square
+def perft_grid(othello, grid, player, depth, check=False):
+
+    if depth == 0:
+        return 1
+
+    actions = othello.get_valid_actions(grid, player)
+
+    if check:
+        size = othello.board.size
+        valid = [(i, j) for i in range(1, size+1) for j in range(1, size+1) if othello.is_valid_action(grid, player, (i, j))]
+        if valid != actions:
+            raise ValueError("is_valid_action gives {} but get_valid_actions gives {}".format(valid, actions))
+
+    if actions == []:
+        if depth == 1 or othello.get_valid_actions(grid, (player+1)%2) == []:
+            return 1
+        return perft_grid(othello, grid, (player+1)%2, depth-1, check)
+
+    if depth == 1:
+        return len(actions)
+
+    count = 0
+    for action in actions:
+        new_grid = [row[:] for row in grid]
+        othello.update_grid(new_grid, player, action)
+        count += perft_grid(othello, new_grid, (player+1)%2, depth-1, check)
+
+    return count
+
+# the grid of the bitboards of a position, with the buffer row/column
+def bits_to_grid(black, white, size=BOARDSIZE):
+
+    grid = [[0 for i in range(size+2)] for j in range(size+2)]
+    for square in range(size*size):
+        i, j = square//size + 1, square%size + 1
+        if black >> square & 1:
+            grid[i][j] = 1
+        elif white >> square & 1:
+            grid[i][j] = -1
+
+    return grid
+
+# count and time every depth of one position, and compare with the reference
+# counts where they are known. True if all the counts match
+def run_position(name, black, white, player, counts, depth, backend, check, size=BOARDSIZE):
+
+    othello = Othello(use_table=False, size=size)
+    passed = True
+
+    for d in range(1, depth+1):
+
+        start = time.perf_counter()
+        if backend == "bits":
+            count = perft_bits(Position(black, white, player, othello.board), d)
+        else:
+            count = perft_grid(othello, bits_to_grid(black, white, size), player, d, check)
+        elapsed = time.perf_counter() - start
+
+        if d < len(counts):
+            ok = count == counts[d]
+            status = "ok" if ok else "FAILED, expected {}".format(counts[d])
+            passed = passed and ok
+        else:
+            status = "no reference"
+
+        print("{} {} depth {}: {} leaves, {:.3f}s, {:.0f} leaves/s, {}".format(
+            name, backend, d, count, elapsed, count / elapsed if elapsed > 0 else 0.0, status))
+
+    return passed
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Perft of the Othello move generator")
+    parser.add_argument("--depth", type=int, default=7, help="largest depth from the starting position")
+    parser.add_argument("--position-depth", type=int, default=None, help="largest depth of the test positions, all known ones if not given")
+    parser.add_argument("--backend", choices=["bits", "grid", "both"], default="both", help="move generator to check")
+    parser.add_argument("--check", action="store_true", help="compare is_valid_action with get_valid_actions on every grid node")
+    parser.add_argument("--size", type=int, choices=BOARDSIZES, default=BOARDSIZE, help="board size, only the 8x8 board has reference counts")
+    args = parser.parse_args()
+
+    if args.backend == "both":
+        backends = ["bits", "grid"]
+    else:
+        backends = [args.backend]
+
+    black, white = Othello(use_table=False, size=args.size).bits
+    if args.size != BOARDSIZE:
+        positions = [("start", black, white, 0, [], args.depth)]
+    else:
+        positions = [("start", black, white, 0, PERFTSTART, args.depth)]
+    for name, black, white, player, counts in PERFTPOSITIONS:
+        if args.size != BOARDSIZE:
+            break
+        if args.position_depth is None:
+            depth = len(counts) - 1
+        else:
+            depth = args.position_depth
+        positions.append((name, black, white, player, counts, depth))
+
+    passed = True
+    for backend in backends:
+        for name, black, white, player, counts, depth in positions:
+            passed = run_position(name, black, white, player, counts, depth, backend, args.check, args.size) and passed
+
+    if not passed:
+        print("Perft FAILED")
+        sys.exit(1)
+    print("Perft ok")
+
+if __name__ == "__main__":
+    main()
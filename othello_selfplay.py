@@ -0,0 +1,293 @@
+'''
+This is a headless runner for the Othello engine in othello.py. It plays
+a number of games between two engines without opening any window, and
+reports the search speed, the move latency and the results of the games.
+The report is written as JSON so that runs can be compared over time.
+
+Example:
+    python othello_selfplay.py --games 20 --engine1 depth=3 --engine2 depth=1,time=0.2 --output run.json
+'''
+
+import argparse
+import json
+import math
+import time
+
+from random import Random
+
+from othello import Othello, BatchEvaluator, BOARDSIZE, BOARDSIZES
+
+# the settings of an engine and their default values
+ENGINEDEFAULTS = {
+    "depth": 3,
+    "time": None,
+    "table": True,
+    "ordering": True,
+    "workers": 1,
+    "eval": "disc",
+}
+
+# read an engine setting such as "depth=3,time=0.5,table=0". The evaluation
+# is "disc", "batch" for the default weights, or the path of a weights file
+def parse_engine(text):
+
+    config = dict(ENGINEDEFAULTS)
+    if text == "":
+        return config
+
+    for item in text.split(","):
+        name, value = item.split("=")
+        name = name.strip()
+        if name not in config:
+            raise ValueError("unknown engine setting {}".format(name))
+
+        if name == "depth" or name == "workers":
+            config[name] = int(value)
+        elif name == "time":
+            config[name] = float(value)
+        elif name == "eval":
+            config[name] = value.strip()
+        else:
+            config[name] = value.strip() not in ("0", "false", "False", "no")
+
+    return config
+
+# build an Othello backend of the board size from the engine settings
+def make_engine(config, size=BOARDSIZE):
+    othello = Othello(config["table"], config["ordering"], size)
+    othello.set_decision_level(config["depth"], config["time"])
+    othello.set_workers(config["workers"])
+    if config["eval"] == "batch":
+        othello.set_evaluator(BatchEvaluator(size=size))
+    elif config["eval"] != "disc":
+        othello.set_evaluator(BatchEvaluator.load(config["eval"], size))
+    return othello
+
+# the p-th percentile of a list of numbers, by the nearest rank
+def percentile(values, p):
+    if values == []:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(p / 100.0 * len(ordered))))
+    return ordered[rank-1]
+
+# speed of the list-grid methods of the backend and of the Tree build
+# from the starting position, so that changes to them can be tracked
+def benchmark_backend(repeat=200, tree_depth=4):
+
+    othello = Othello(use_table=False)
+    othello.player = 0
+
+    start = time.perf_counter()
+    for k in range(repeat):
+        actions = othello.get_valid_actions(othello.grid, 0)
+    valid_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for k in range(repeat):
+        grid = [row[:] for row in othello.grid]
+        othello.update_grid(grid, 0, actions[0])
+    update_time = (time.perf_counter() - start) / repeat
+
+    othello.set_decision_level(tree_depth)
+    start = time.perf_counter()
+    othello.tree_actions()
+    tree_time = time.perf_counter() - start
+
+    return {
+        "get_valid_actions_per_second": 1.0 / valid_time,
+        "update_grid_per_second": 1.0 / update_time,
+        "tree_depth": tree_depth,
+        "tree_nodes_per_second": othello.nodes / tree_time,
+    }
+
+# play the self-play games between two engines and collect the statistics
+class OthelloSelfPlay():
+
+    def __init__(self, config1, config2, seed=None, random_moves=0, record=False, size=BOARDSIZE):
+
+        self.configs = [config1, config2]
+        self.engines = [make_engine(config1, size), make_engine(config2, size)]
+
+        # random moves at the start of each game so that the games differ
+        self.random = Random(seed)
+        self.random_moves = random_moves
+
+        # the board of the games, the engines only get a copy of it
+        self.board = Othello(use_table=False, size=size)
+
+        # per engine: latency of every move and number of searched nodes,
+        # the time of the endgame solver is counted apart from the midgame
+        self.latency = [[], []]
+        self.nodes = [0, 0]
+        self.search_time = [0.0, 0.0]
+        self.endgame_latency = [[], []]
+        self.endgame_nodes = [0, 0]
+
+        # wins of engine 1, wins of engine 2, draws, and a record of every game
+        self.result = [0, 0, 0]
+        self.games = []
+
+        # with record, every position of the games as (black, white, final
+        # score of the game) for fitting the evaluation, see othello_fit.py
+        self.record = record
+        self.positions = []
+
+    # play one game, engine "first" plays player 0 (black) which moves first
+    def play_game(self, first):
+
+        board = self.board
+        board.reset_game()
+        board.player = 0
+
+        moves = 0
+        positions = []
+
+        # the board passes the moves of a player without a move by itself,
+        # and the game ends when neither player has a move
+        while board.end_game == False:
+
+            if self.record:
+                positions.append(tuple(board.bits))
+
+            if moves < self.random_moves:
+                action = self.random.choice(board.get_valid_actions(board.grid, board.player))
+            else:
+                index = (first + board.player) % 2
+                action = self.search_move(index)
+
+            board.play_action(action)
+            moves += 1
+
+        # the score is the net number of chess of player 0
+        score = board.score
+        self.positions.extend((black, white, score) for black, white in positions)
+        if score > 0:
+            winner = first
+        elif score < 0:
+            winner = (first+1) % 2
+        else:
+            winner = None
+
+        if winner is None:
+            self.result[2] += 1
+        else:
+            self.result[winner] += 1
+
+        self.games.append({"black": first+1, "score": score, "moves": moves, "winner": None if winner is None else winner+1})
+
+    # let the engine search the move on a copy of the board
+    def search_move(self, index):
+
+        engine = self.engines[index]
+        engine.overwrite_grid(self.board.grid)
+        engine.player = self.board.player
+
+        start = time.perf_counter()
+        action = engine.decision_tree()
+        latency = time.perf_counter() - start
+
+        self.latency[index].append(latency)
+        self.nodes[index] += engine.nodes
+        self.search_time[index] += engine.search_time
+
+        if engine.endgame_nodes > 0:
+            self.endgame_latency[index].append(engine.endgame_time)
+            self.endgame_nodes[index] += engine.endgame_nodes
+
+        return action
+
+    # play all the games, the engines take turns to play black
+    def run(self, games):
+
+        start = time.perf_counter()
+        for game in range(games):
+            self.play_game(game % 2)
+        self.wall_time = time.perf_counter() - start
+
+        for engine in self.engines:
+            engine.close_pool()
+
+        return self.report()
+
+    # summary of the run as a dictionary ready for JSON
+    def report(self):
+
+        games = len(self.games)
+        engines = []
+
+        for index in range(2):
+            latency = self.latency[index]
+            endgame_latency = self.endgame_latency[index]
+            endgame_time = sum(endgame_latency)
+            midgame_time = self.search_time[index] - endgame_time
+            midgame_nodes = self.nodes[index] - self.endgame_nodes[index]
+            engines.append({
+                "config": self.configs[index],
+                "moves": len(latency),
+                "nodes": self.nodes[index],
+                "nodes_per_second": self.nodes[index] / self.search_time[index] if self.search_time[index] > 0 else 0.0,
+                "avg_latency": sum(latency) / len(latency) if latency != [] else 0.0,
+                "p95_latency": percentile(latency, 95),
+                "max_latency": max(latency) if latency != [] else 0.0,
+                "win_rate": self.result[index] / games if games > 0 else 0.0,
+                "midgame_time": midgame_time,
+                "midgame_nodes_per_second": midgame_nodes / midgame_time if midgame_time > 0 else 0.0,
+                "endgame_solves": len(endgame_latency),
+                "endgame_time": endgame_time,
+                "endgame_nodes_per_second": self.endgame_nodes[index] / endgame_time if endgame_time > 0 else 0.0,
+                "endgame_avg_latency": endgame_time / len(endgame_latency) if endgame_latency != [] else 0.0,
+                "endgame_p95_latency": percentile(endgame_latency, 95),
+            })
+
+        return {
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "games": games,
+            "size": self.board.board.size,
+            "random_moves": self.random_moves,
+            "wall_time": self.wall_time,
+            "engines": engines,
+            "wins": self.result[:2],
+            "draws": self.result[2],
+            "draw_rate": self.result[2] / games if games > 0 else 0.0,
+            "results": self.games,
+            "backend": benchmark_backend(),
+        }
+
+# print the main numbers of the report
+def print_report(report):
+
+    backend = report["backend"]
+    print("Backend: get_valid_actions {:.0f}/s, update_grid {:.0f}/s, Tree build {:.0f} nodes/s".format(
+        backend["get_valid_actions_per_second"], backend["update_grid_per_second"], backend["tree_nodes_per_second"]))
+    print("Games: {}, draws: {} ({:.1%})".format(report["games"], report["draws"], report["draw_rate"]))
+    for index, engine in enumerate(report["engines"]):
+        print("Engine {} {}: win {:.1%}, {:.0f} nodes/s, latency avg {:.4f}s p95 {:.4f}s".format(
+            index+1, engine["config"], engine["win_rate"], engine["nodes_per_second"],
+            engine["avg_latency"], engine["p95_latency"]))
+        print("    midgame {:.2f}s, endgame {:.2f}s in {} solves (p95 {:.4f}s)".format(
+            engine["midgame_time"], engine["endgame_time"], engine["endgame_solves"], engine["endgame_p95_latency"]))
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Headless Othello self-play and benchmark")
+    parser.add_argument("--games", type=int, default=10, help="number of games")
+    parser.add_argument("--engine1", default="", help="settings of engine 1, e.g. depth=3,time=0.5,table=1,ordering=1,workers=1,eval=batch")
+    parser.add_argument("--engine2", default="", help="settings of engine 2")
+    parser.add_argument("--random-moves", type=int, default=2, help="random moves at the start of every game")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random moves")
+    parser.add_argument("--output", default=None, help="JSON file for the report")
+    parser.add_argument("--size", type=int, choices=BOARDSIZES, default=BOARDSIZE, help="board size of the games")
+    args = parser.parse_args()
+
+    self_play = OthelloSelfPlay(parse_engine(args.engine1), parse_engine(args.engine2), args.seed, args.random_moves,
+        size=args.size)
+    report = self_play.run(args.games)
+
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,17 @@ Written by Shing Chi Leung at 19 February 2021
 import pygame
 from pygame.locals import *
 
+import argparse
+import logging
+import os
+import struct
 import sys
+import threading
+import queue
+import time
+import tracemalloc
 
-from random import randint, choice
+from random import randint, choice, Random
 
 # geometry of the App
 WINDOWWIDTH = 300
@@ -40,21 +48,182 @@ MARGINSIZE = 10
 # for a purple-ish colour for a pleasant look
 BGCOLOR = (100, 100, 255)
 
-# load all the image file at the front
-GRIDIMG = pygame.image.load("tictactoe_grid.png")
-CIRCLEIMG = pygame.image.load("tictactoe_circle.png")
-CROSSIMG = pygame.image.load("tictactoe_cross.png")
+# colour of the grid lines of the boards other than 3x3
+LINECOLOR = (0, 0, 0)
+
+# all the image files, they are only loaded by the app when first drawn
+# so that the backend can be used without them
+IMAGEFILES = {
+    "grid": "tictactoe_grid.png",
+    "circle": "tictactoe_circle.png",
+    "cross": "tictactoe_cross.png",
+
+    # button image files
+    "easy": "tictactoe_easy_btn.png",
+    "hard": "tictactoe_hard_btn.png",
+    "reset": "tictactoe_reset_btn.png",
+}
+
+# the debug output of the game goes through this logger, it is only shown
+# when the app is started by main() or when the caller sets up logging
+logger = logging.getLogger("tictactoe")
+
+# difficulties as the lookahead of the AI in moves, the hard level
+# looks until the end of the game and plays perfectly
+EASYLEVEL = 1
+HARDLEVEL = 9
+
+# the board is encoded as a base-3 integer, cell (i, j) is the digit
+# 3*i+j which is 0 for empty, 1 for player 0 and 2 for player 1
+POWERS = [3**k for k in range(9)]
+DIGITS = {0: 0, 1: 1, -1: 2}
+
+# the eight symmetries of the board (rotations and reflections), each one
+# gives for every cell the cell whose digit it takes
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),    # identity
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),    # rotate 90
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),    # rotate 180
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),    # rotate 270
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),    # mirror left-right
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),    # mirror up-down
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),    # mirror main diagonal
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),    # mirror other diagonal
+]
+
+# the lines through every cell, a move can only win on one of them
+LINES = [(0, 1, 2), (3, 4, 5), (6, 7, 8), (0, 3, 6), (1, 4, 7), (2, 5, 8), (0, 4, 8), (2, 4, 6)]
+CELLLINES = [[line for line in LINES if cell in line] for cell in range(9)]
+
+# check if the chess on the cell completes one of its lines
+def is_win(cells, cell):
+    digit = cells[cell]
+    for a, b, c in CELLLINES[cell]:
+        if cells[a] == digit and cells[b] == digit and cells[c] == digit:
+            return True
+    return False
+
+# the digits of the cells of a base-3 code
+def decode_cells(code):
+    cells = []
+    for k in range(9):
+        cells.append(code % 3)
+        code //= 3
+    return cells
+
+# the cache file starts with a header (magic, version, number of records),
+# followed by fixed-size records (canonical code, player to move, lookahead,
+# score, seconds taken to solve)
+CACHEFILE = "tictactoe_cache.bin"
+CACHEMAGIC = b"TTTCACHE"
+CACHEVERSION = 1
+CACHEHEADER = struct.Struct("<8sBI")
+CACHERECORD = struct.Struct("<HBBbf")
+
+# the solved positions shared by all the games of the process. A position is
+# stored once for all its symmetries as (canonical code, player to move,
+# lookahead) to (score, seconds taken to solve it), so that a hit knows the
+# time it saved
+class SolveCache():
 
-# button image files
-EASYBTN = pygame.image.load("tictactoe_easy_btn.png")
-HARDBTN = pygame.image.load("tictactoe_hard_btn.png")
-RESETBTN = pygame.image.load("tictactoe_reset_btn.png")
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.solve_time = 0.0
+        self.saved_time = 0.0
+
+    # the score of the key, None if it is not solved yet
+    def probe(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved_time += entry[1]
+        return entry[0]
+
+    # the solve time includes the time of the positions solved below it,
+    # only the top-level solves are added to the total
+    def store(self, key, score, seconds, top=False):
+        self.entries[key] = (score, seconds)
+        if top:
+            self.solve_time += seconds
+
+    def clear(self):
+        self.entries = {}
+
+    # the hit rate and the time spent and saved by the cache
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes > 0 else 0.0,
+            "solve_time": self.solve_time,
+            "saved_time": self.saved_time,
+        }
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(CACHEHEADER.pack(CACHEMAGIC, CACHEVERSION, len(self.entries)))
+            for (code, player, depth), (score, seconds) in sorted(self.entries.items()):
+                f.write(CACHERECORD.pack(code, player, depth, score, seconds))
+
+    # add the records of the file to the cache
+    def load(self, path):
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version, count = CACHEHEADER.unpack_from(data, 0)
+        if magic != CACHEMAGIC or version != CACHEVERSION:
+            raise ValueError("{} is not a tic-tac-toe cache".format(path))
+
+        for index in range(count):
+            code, player, depth, score, seconds = CACHERECORD.unpack_from(data, CACHEHEADER.size + index*CACHERECORD.size)
+            self.entries[(code, player, depth)] = (score, seconds)
+
+# the cache of the process, used by every Tictactoe unless it is given its own
+CACHE = SolveCache()
+
+# the m,n,k-game (rows x columns board, k in a row wins) is searched with a
+# depth and time limit, the hard level searches deeper until the time is up
+MNKHARDLEVEL = 8
+MNKTIMELIMIT = 1.0
+
+# nodes between the checks of the time limit
+TIMECHECK = 1024
+
+# empty cells within this distance of a chess are the candidate moves
+MNKRADIUS = 2
+
+# the transposition table is cleared when it holds more entries than this
+MNKTABLESIZE = 1000000
+
+# flags of the transposition table entries, the score is exact, at least
+# (fail high) or at most (fail low) the stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Zobrist keys of the m,n,k-game, one random number for every cell and
+# player, and one for player 1 to move
+ZOBRISTSEED = 20210219
+
+# raised inside the search when the time limit is up
+class SearchTimeout(Exception):
+    pass
 
 # the backend of the app. This includes the AI player and 
 # contains the whole game flow
 class Tictactoe():
 
-    def __init__(self):
+    # the decision levels of the easy and hard buttons
+    levels = (EASYLEVEL, HARDLEVEL)
+
+    def __init__(self, cache=None):
         self.grid = [[0 for i in range(3)] for j in range(3)]
         #self.grid[1][0] = 1
 
@@ -62,15 +231,28 @@ class Tictactoe():
         self.player = 0 #randint(0,1) 0 for player and 1 for AI
 
         # depth of the decision tree for the game difficulty
-        self.decision_level = 3
+        self.decision_level = HARDLEVEL
+
+        # the solved positions, kept between the moves and the games
+        if cache is None:
+            cache = CACHE
+        self.cache = cache
 
         # check whether the game is finished
         self.end_game = False
         self.winner = None
 
+        # the root of the Tree of tree_actions, kept to be re-rooted at the
+        # position of the next call
+        self.tree = None
+
         # count of win, lose and draw games for the score
         self.result = [0, 0, 0]
 
+        # set to stop the search running on a background thread, only the
+        # m,n,k-game search is long enough to check it
+        self.cancel = threading.Event()
+
     # change player after one of the players' move
     def switch_player(self):
         self.player = (self.player+1)%2
@@ -79,10 +261,20 @@ class Tictactoe():
     def set_decision_level(self, value):
         self.decision_level = value
 
-    # restart the game 
+    # stop the search of the AI as soon as it checks the cancel event
+    def cancel_search(self):
+        self.cancel.set()
+
+    def clear_cancel(self):
+        self.cancel.clear()
+
+    # restart the game, the player moves first even if the reset came
+    # during the turn of the AI
     def reset_game(self):
         self.clean_grid()
         self.end_game = False
+        self.tree = None
+        self.player = 0
 
     # remove all the chess (O or X) on the board
     def clean_grid(self):
@@ -112,7 +304,7 @@ class Tictactoe():
 
     def check_end_game(self):
         score = self.check_score(self.grid)
-        print("Score = {}, {}".format(score, self.check_full_grid(self.grid)))
+        logger.debug("Score = {}, {}".format(score, self.check_full_grid(self.grid)))
 
         # end game by one player wins
         if score != 0:
@@ -120,16 +312,16 @@ class Tictactoe():
             if score == 1:
                 self.winner = 0
                 self.result[0] += 1
-                print("Player 1 wins!")
+                logger.info("Player 1 wins!")
             elif score == -1:
                 self.winner = 1
                 self.result[1] += 1
-                print("Player 2 wins!")
+                logger.info("Player 2 wins!")
 
         # end game by no more move
         if score==0 and self.check_full_grid(self.grid):
             self.end_game = True
-            print("Game draw!")
+            logger.info("Game draw!")
             self.result[2] += 1
 
     # check if all the grids are filled
@@ -148,80 +340,155 @@ class Tictactoe():
     def player_step(self):
 
         # the AI builds a decision based on the current grid
-        action = self.decision_tree()
+        self.play_action(self.decision_tree())
+
+    # add the move of the AI, chosen by decision_tree
+    def play_action(self, action):
+
         added_move = self.add_move(action)
 
         # check if the AI's move lead to end game
         is_end_game = self.check_end_game()
 
         # for debug use
-        print("Player {} added move {}.".format(self.player, action))
+        logger.debug("Player {} added move {}.".format(self.player, action))
 
         # switch player
         self.switch_player()
 
-    # build a decision tree 
+    # choose the move of the AI by the memoized minimax, one of the best
+    # moves is chosen by random
     def decision_tree(self):
 
-        # copy the global variables to local variables to avoid confusion
         player = self.player
-        curr_grid = [[self.grid[j][i] for i in range(3)] for j in range(3)]
-
-        # tree is newly built in every step
-        tree = Tree(curr_grid, player, None, 0)
-
-        # generate predictions by finding the best move from the tree
-        tree = self.extend_tree(tree, player, 0)
-        score = tree.pass_score(player)
-        actions = tree.select_best_child()
-        #tree.print_tree(0)
+        cells = self.grid_cells(self.grid)
+        empties = cells.count(0)
+
+        # the score of every move from the side of player 0, the
+        # positions after the moves are looked up in the cache
+        actions = []
+        best = None
+        for cell in range(9):
+            if cells[cell] != 0:
+                continue
+
+            cells[cell] = player + 1
+            if is_win(cells, cell):
+                score = empties if player == 0 else -empties
+            else:
+                score = self.solve(cells, (player+1)%2, self.decision_level-1, True)
+            cells[cell] = 0
+
+            if best is None or player == 0 and score > best or player == 1 and score < best:
+                best = score
+                actions = [(cell//3, cell%3)]
+            elif score == best:
+                actions.append((cell//3, cell%3))
 
         # only one of the best moves is chosen
         return choice(actions)
 
-    # a recursive function to extend the tree using depth-first approach
-    def extend_tree(self, tree, curr_player, level):
-        
-        # make sure the loop does not repeat indefinitely
-        if level == self.decision_level: return tree
-        level += 1
-
-        for i in range(3):
-            for j in range(3):
-
-                # there is no restriction which grid can be placed next, thus 
-                # all empty grids must be checked
-                if tree.grid[i][j] == 0:
-                    action = (i, j)
-
-                    # build the next step
-                    player = curr_player
-
-                    # build the new grid using the candidate action
-                    if player == 0:
-                        new_grid = [[tree.grid[j][i] for i in range(3)] for j in range(3)]
-                        new_grid[i][j] = 1
-                    else:
-                        new_grid = [[tree.grid[j][i] for i in range(3)] for j in range(3)]
-                        new_grid[i][j] = -1
-                    
-                    # check the score (i.e. the result of the board)
-                    score = self.check_score(new_grid)
-
-                    # build a new tree node using the new grid
-                    child = Tree(new_grid, (player+1)%2, action, score)
+    # the score of the position with the player to move, looking ahead at
+    # most depth moves. A win scores the number of empty cells before the
+    # winning move, so a quicker win is better, positive for player 0 and
+    # negative for player 1. The score of a position is the same for all its
+    # symmetries, so it is stored once under the smallest code of them
+    def solve(self, cells, player, depth, top=False):
+
+        empties = cells.count(0)
+        if depth > empties:
+            depth = empties
+        if depth == 0:
+            return 0
+
+        key = (self.canonical_code(cells), player, depth)
+        score = self.cache.probe(key)
+        if score is not None:
+            return score
+
+        start = time.perf_counter()
+        best = None
+        for cell in range(9):
+            if cells[cell] != 0:
+                continue
+
+            cells[cell] = player + 1
+            if is_win(cells, cell):
+                score = empties if player == 0 else -empties
+            else:
+                score = self.solve(cells, (player+1)%2, depth-1)
+            cells[cell] = 0
+
+            if best is None or player == 0 and score > best or player == 1 and score < best:
+                best = score
+
+        self.cache.store(key, best, time.perf_counter() - start, top)
+
+        return best
+
+    # the digits of the grid in the order of the cells
+    def grid_cells(self, grid):
+        return [DIGITS[grid[i][j]] for i in range(3) for j in range(3)]
+
+    # the smallest base-3 code of the cells among the eight symmetries
+    def canonical_code(self, cells):
+        return min(sum(cells[symmetry[k]] * POWERS[k] for k in range(9)) for symmetry in SYMMETRIES)
+
+    # get the best move(s) by the Tree class, kept for debug use and for
+    # comparison with the solver. The tree of the last call is re-rooted at
+    # the current position if it is found within two moves of the old root,
+    # and the nodes are only expanded when the search first visits them
+    def tree_actions(self):
 
-                    if child.score != 0:    
-                        print("Going to extend tree {} {} {}".format(new_grid, action, level))
+        player = self.player
+        code = 0
+        for cell, digit in enumerate(self.grid_cells(self.grid)):
+            code += digit * POWERS[cell]
 
-                    # only extend the tree if the new_grid is not an end game
-                    if child.score == 0:
-                        child = self.extend_tree(child, (player+1)%2, level)
+        self.tree = self.find_root(code, player)
 
-                    # add the fully developed child to the original tree
-                    tree.add_child(child)
-                
-        return tree
+        # generate predictions by finding the best move from the tree
+        score = self.tree.pass_score(player, self.decision_level)
+        actions = self.tree.select_best_child()
+        #self.tree.print_tree(0)
+
+        return actions
+
+    # the node of the position in the old tree after our move and the
+    # reply of the other player, or a new tree
+    def find_root(self, code, player):
+
+        if self.tree is not None:
+            nodes = [self.tree]
+            for level in range(2):
+                children = []
+                for node in nodes:
+                    if node.children is not None:
+                        children.extend(node.children)
+                for node in children:
+                    if node.code == code and node.player == player:
+                        return node
+                nodes = children
+
+        return Tree(code, player, None, 0)
+
+    # the peak memory, the memory blocks still held by the tree and the
+    # number of nodes of a tree_actions call from a new tree, for
+    # comparing the changes of the Tree class
+    def tree_memory(self):
+
+        self.tree = None
+        tracemalloc.start()
+        self.tree_actions()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "peak_bytes": peak,
+            "blocks": sum(stat.count for stat in snapshot.statistics("filename")),
+            "nodes": self.tree.count_nodes(),
+        }
 
     # check the total score based on the game board
     def check_score(self, grid):
@@ -254,52 +521,359 @@ class Tictactoe():
 
         return score
 
+# the backend of the m,n,k-game, such as 4x4 with 4 in a row or 15x15
+# gomoku. Every line of k cells (a window) keeps the count of the chess of
+# both players, so a move only updates the windows through its own cell to
+# find a win and to update the evaluation. The AI searches the cells near
+# the chess by alpha-beta with a transposition table
+class MNKGame(Tictactoe):
+
+    levels = (EASYLEVEL, MNKHARDLEVEL)
+
+    def __init__(self, rows, cols, k, cache=None):
+
+        Tictactoe.__init__(self, cache)
+
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.size = rows * cols
+        self.grid = [[0 for j in range(cols)] for i in range(rows)]
+
+        self.decision_level = MNKHARDLEVEL
+        self.time_limit = MNKTIMELIMIT
+
+        # the windows as lists of cells, cell (i, j) is i*cols+j, and the
+        # windows through every cell
+        self.windows = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    if 0 <= i + (k-1)*di < rows and 0 <= j + (k-1)*dj < cols:
+                        self.windows.append([(i + n*di)*cols + j + n*dj for n in range(k)])
+        self.cell_windows = [[] for cell in range(self.size)]
+        for window, cells in enumerate(self.windows):
+            for cell in cells:
+                self.cell_windows[cell].append(window)
+
+        # a window with n chess of only one player scores 4**n for him, a
+        # win scores more than all the windows together
+        self.window_scores = [0] + [4**n for n in range(1, k+1)]
+        self.win_score = len(self.windows) * 4**k + 1
+
+        # the cells within MNKRADIUS of every cell
+        self.neighbours = []
+        for i in range(rows):
+            for j in range(cols):
+                self.neighbours.append([a*cols + b for a in range(max(0, i-MNKRADIUS), min(rows, i+MNKRADIUS+1))
+                    for b in range(max(0, j-MNKRADIUS), min(cols, j+MNKRADIUS+1)) if (a, b) != (i, j)])
+
+        zobrist_random = Random(ZOBRISTSEED)
+        self.zobrist = [[zobrist_random.getrandbits(64) for cell in range(self.size)] for player in range(2)]
+        self.zobrist_player = zobrist_random.getrandbits(64)
+
+        # the position hash to (depth, score, flag, best cell)
+        self.table = {}
+        self.nodes = 0
+
+        self.clean_grid()
+
+    # remove all the chess and reset the counts of the windows
+    def clean_grid(self):
+
+        for i in range(self.rows):
+            for j in range(self.cols):
+                self.grid[i][j] = 0
+
+        self.cells = [0] * self.size
+        self.counts = [[0] * len(self.windows), [0] * len(self.windows)]
+        self.near = [0] * self.size
+        self.moves = 0
+        self.hash = 0
+        self.evaluation = 0
+        self.last_score = 0
+
+    # add the move to the game board and to the window counts
+    def add_move(self, action):
+
+        added_move = Tictactoe.add_move(self, action)
+        if added_move:
+            i, j = action
+            won = self.make_move(i*self.cols + j, self.player)
+            if won:
+                self.last_score = 1 if self.player == 0 else -1
+
+        return added_move
+
+    # the score of the board after the last move, known from the window
+    # counts without scanning the grid
+    def check_score(self, grid):
+        return self.last_score
+
+    def check_full_grid(self, grid):
+        return self.moves == self.size
+
+    # the score of a window with c0 chess of player 0 and c1 of player 1,
+    # only a window with the chess of one player can still be completed
+    def window_score(self, c0, c1):
+        if c1 == 0:
+            return self.window_scores[c0]
+        if c0 == 0:
+            return -self.window_scores[c1]
+        return 0
+
+    # put the chess of the player on the cell and update the windows, the
+    # hash and the evaluation. True if the move completes a window
+    def make_move(self, cell, player):
+
+        self.cells[cell] = 1 if player == 0 else -1
+        self.moves += 1
+        self.hash ^= self.zobrist[player][cell]
+        for neighbour in self.neighbours[cell]:
+            self.near[neighbour] += 1
+
+        count0, count1 = self.counts
+        mine = self.counts[player]
+        won = False
+        for window in self.cell_windows[cell]:
+            before = self.window_score(count0[window], count1[window])
+            mine[window] += 1
+            self.evaluation += self.window_score(count0[window], count1[window]) - before
+            if mine[window] == self.k:
+                won = True
+
+        return won
+
+    # take back the move of make_move
+    def unmake_move(self, cell, player):
+
+        self.cells[cell] = 0
+        self.moves -= 1
+        self.hash ^= self.zobrist[player][cell]
+        for neighbour in self.neighbours[cell]:
+            self.near[neighbour] -= 1
+
+        count0, count1 = self.counts
+        mine = self.counts[player]
+        for window in self.cell_windows[cell]:
+            before = self.window_score(count0[window], count1[window])
+            mine[window] -= 1
+            self.evaluation += self.window_score(count0[window], count1[window]) - before
+
+    # the empty cells next to the chess, the centre on an empty board. The
+    # cells in the most open windows of both players come first, and the
+    # best cell of the table before them
+    def candidates(self, first=None):
+
+        cells = [cell for cell in range(self.size) if self.cells[cell] == 0 and self.near[cell] > 0]
+        if cells == []:
+            if self.moves > 0:
+                return [cell for cell in range(self.size) if self.cells[cell] == 0]
+            return [(self.rows//2)*self.cols + self.cols//2]
+
+        count0, count1 = self.counts
+        scores = self.window_scores
+        def priority(cell):
+            total = 0
+            for window in self.cell_windows[cell]:
+                c0 = count0[window]
+                c1 = count1[window]
+                if c1 == 0:
+                    total += scores[c0]
+                if c0 == 0:
+                    total += scores[c1]
+            return total
+        cells.sort(key=priority, reverse=True)
+
+        if first is not None and first in cells:
+            cells.remove(first)
+            cells.insert(0, first)
+
+        return cells
+
+    # the best moves by iterative deepening up to the decision level, the
+    # moves of the last search finished within the time limit are used
+    def decision_tree(self):
+
+        player = self.player
+        self.nodes = 0
+        self.deadline = time.perf_counter() + self.time_limit
+        if len(self.table) > MNKTABLESIZE:
+            self.table = {}
+
+        # the only candidate, such as the centre of the empty board, is
+        # played without a search
+        cells = self.candidates()
+        if len(cells) == 1:
+            return (cells[0] // self.cols, cells[0] % self.cols)
+
+        actions = [cells[0]]
+        for depth in range(1, min(self.decision_level, self.size - self.moves) + 1):
+            try:
+                actions = self.root_search(player, depth)
+            except SearchTimeout:
+                break
+
+        cell = choice(actions)
+        return (cell // self.cols, cell % self.cols)
+
+    # all the moves of the best score at the root. Every move is searched
+    # with a window just below the best score so far, so the moves as good
+    # as the best get their exact score
+    def root_search(self, player, depth):
+
+        entry = self.table.get(self.hash ^ (self.zobrist_player if player == 1 else 0))
+        best = -self.win_score * 2
+        actions = []
+        for cell in self.candidates(None if entry is None else entry[3]):
+            score = self.search_move(cell, player, depth, best-1, self.win_score * 2)
+            if score > best:
+                best = score
+                actions = [cell]
+            elif score == best:
+                actions.append(cell)
+
+        return actions
+
+    # the score of the move for the player, the chess is taken back even
+    # when the time is up in the middle of the search
+    def search_move(self, cell, player, depth, alpha, beta):
+
+        empties = self.size - self.moves
+        won = self.make_move(cell, player)
+        try:
+            if won:
+                return self.win_score + empties
+            return -self.alpha_beta((player+1)%2, depth-1, -beta, -alpha)
+        finally:
+            self.unmake_move(cell, player)
+
+    # the negamax alpha-beta search, the score is from the side of the
+    # player to move. A win scores more with more empty cells left, so a
+    # quicker win is better and a loss is put off
+    def alpha_beta(self, player, depth, alpha, beta):
+
+        self.nodes += 1
+        if self.nodes % TIMECHECK == 0 and (self.cancel.is_set() or time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+        if depth == 0 or self.moves == self.size:
+            return self.evaluation if player == 0 else -self.evaluation
+
+        key = self.hash ^ (self.zobrist_player if player == 1 else 0)
+        entry = self.table.get(key)
+        best_cell = None
+        if entry is not None:
+            entry_depth, score, flag, best_cell = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        start_alpha = alpha
+        best = None
+        for cell in self.candidates(best_cell):
+            score = self.search_move(cell, player, depth, alpha, beta)
+            if best is None or score > best:
+                best = score
+                best_cell = cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best <= start_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best, flag, best_cell)
+
+        return best
+
 # this is the backend supporting class for building the general abstract tree
-# which I built from scratch. The data structure is fine tuned for Tic-Tac-Toe
+# which I built from scratch. The data structure is fine tuned for Tic-Tac-Toe:
+# the grid is kept as its base-3 code, and the node has fixed slots instead
+# of a dictionary so that a deep tree takes little memory
 class Tree():
 
-    def __init__(self, grid, player, action, score):
+    __slots__ = ("code", "player", "cell", "score", "value", "children")
 
-        # the current grid
-        self.grid = grid
+    def __init__(self, code, player, cell, score):
+
+        # the base-3 code of the grid
+        self.code = code
 
         # the player that needs to move next
         self.player = player
 
-        # the action that leads to this grid from the parent
-        self.action = action
+        # the cell (3*i+j of the action) that leads to this grid from the parent
+        self.cell = cell
 
-        # the implied score of the board
+        # the implied score of the board, and the score passed from the
+        # children by the last search
         self.score = score
+        self.value = score
 
-        # its children for the next possible steps
-        self.children = []
+        # its children for the next possible steps, None until expanded
+        self.children = None
 
-    # add a new child as a possible move
-    def add_child(self, child):
-        self.children.append(child)
+    # make the children for all the empty grids once, an end game
+    # has no children
+    def expand(self):
 
-    # pass the score from the bottom of the tree to the top 
-    # based on the MinMax criteria. 
-    def pass_score(self, player):
+        if self.children is not None:
+            return self.children
+
+        if self.score != 0:
+            self.children = ()
+            return self.children
+
+        self.children = []
+        player = self.player
+        digit = player + 1
+        cells = decode_cells(self.code)
+        for cell in range(9):
+            if cells[cell] == 0:
+                cells[cell] = digit
+                if is_win(cells, cell):
+                    score = 1 if player == 0 else -1
+                else:
+                    score = 0
+                cells[cell] = 0
+                self.children.append(Tree(self.code + digit*POWERS[cell], (player+1)%2, cell, score))
+
+        return self.children
+
+    # pass the score from the bottom of the tree to the top based on the
+    # MinMax criteria, looking at most depth moves ahead
+    def pass_score(self, player, depth):
 
         # For player turn, take maximum
         # i.e. the AI tries to get the best move
         # For AI turn, take minimum
         # i.e. the AI wants the player get the worst move
 
+        self.value = self.score
+        if depth == 0 or self.score != 0:
+            return self.value
+
         if player == 1: 
-            for child in self.children:
-                score = child.pass_score((player+1)%2)
-                if score < self.score:
-                    self.score = score
+            for child in self.expand():
+                score = child.pass_score((player+1)%2, depth-1)
+                if score < self.value:
+                    self.value = score
         else:    
-            for child in self.children:
-                score = child.pass_score((player+1)%2)
-                if score > self.score:
-                    self.score = score
+            for child in self.expand():
+                score = child.pass_score((player+1)%2, depth-1)
+                if score > self.value:
+                    self.value = score
        
-        return self.score
+        return self.value
 
     # from the top node, decides which child inherits the best moves from
     # its child, choose the action which leads to that child
@@ -309,28 +883,38 @@ class Tree():
         action = []
 
         for child in self.children:
-            #print(child.grid, child.score, self.score)
-            if child.score == self.score:
-                action.append(child.action)
+            #print(child.code, child.value, self.value)
+            if child.value == self.value:
+                action.append((child.cell//3, child.cell%3))
 
         # random sample if no action taken by MinMax
         if action == []:
-            action.append(choice(self.children).action)
+            cell = choice(self.children).cell
+            action.append((cell//3, cell%3))
 
         return action
 
+    # the number of nodes made so far
+    def count_nodes(self):
+        count = 1
+        if self.children is not None:
+            for child in self.children:
+                count += child.count_nodes()
+        return count
+
     # for debug use
     def print_tree(self, level):
         print("At level {}".format(level))
-        print("grid={}, player={}, action={}, score={}".format(self.grid, self.player, self.action, self.score))
-        for child in self.children:
-            child.print_tree(level+1)
+        print("grid={}, player={}, action={}, score={}".format(decode_cells(self.code), self.player, self.cell, self.value))
+        if self.children is not None:
+            for child in self.children:
+                child.print_tree(level+1)
 
 # the frontend class for drawing the GUI and calling the backend class
 # to allow interaction between the human player with the game
 class TicTacToeApp():
 
-    def __init__(self):
+    def __init__(self, rows=3, cols=3, k=3):
 
         pygame.init()
 
@@ -345,10 +929,37 @@ class TicTacToeApp():
 
         # meta-information for the app
         pygame.display.set_caption("Tic Tac Toe")
-        pygame.display.set_icon(pygame.image.load("tictactoe_circle.png"))
+        self.images = {}
+        pygame.display.set_icon(self.get_image("circle"))
+
+        # call the backend as its variable. The 3x3 game is solved with the
+        # positions solved in the previous sessions, the other boards are
+        # played by the m,n,k-game backend
+        self.solved = (rows, cols, k) == (3, 3, 3)
+        if self.solved:
+            self.tictactoe = Tictactoe()
+            if os.path.exists(CACHEFILE):
+                self.tictactoe.cache.load(CACHEFILE)
+        else:
+            self.tictactoe = MNKGame(rows, cols, k)
+        self.rows = rows
+        self.cols = cols
+
+        # the chess images are scaled to the tiles of the larger boards
+        self.tile_size = TILESIZE if self.solved else GRIDSIZE // max(rows, cols)
+        self.margin = MARGINSIZE * self.tile_size // TILESIZE
+        image_size = (IMGSIZE[0] * self.tile_size // TILESIZE, IMGSIZE[1] * self.tile_size // TILESIZE)
+        if self.solved:
+            self.circle_img = self.get_image("circle")
+            self.cross_img = self.get_image("cross")
+        else:
+            self.circle_img = pygame.transform.smoothscale(self.get_image("circle"), image_size)
+            self.cross_img = pygame.transform.smoothscale(self.get_image("cross"), image_size)
 
-        # call the backend as its variable
-        self.tictactoe = Tictactoe()
+        # the AI searches on a background thread and puts its move in the
+        # queue, so the window keeps responding during the search
+        self.search_thread = None
+        self.search_queue = queue.Queue()
 
         while True:
 
@@ -360,6 +971,10 @@ class TicTacToeApp():
             # manage all user's input
             for event in pygame.event.get():
                 if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
+                    self.stop_ai_search()
+                    if self.solved:
+                        self.tictactoe.cache.save(CACHEFILE)
+                        logger.info("Solve cache: {}".format(self.tictactoe.cache.stats()))
                     pygame.quit()
                     sys.exit()
                 elif event.type == MOUSEBUTTONDOWN:
@@ -368,23 +983,58 @@ class TicTacToeApp():
                     
             # after the other player move, the AI does its move
             if self.tictactoe.end_game == False and self.tictactoe.player == 1:
-                self.tictactoe.player_step()
+                self.poll_ai_search()
 
             # update the screen after the game board is updated
             pygame.display.update()
             self.fps_clock.tick(FPS)
 
+    # start the AI search if it is not running, and play its move once
+    # the search is done
+    def poll_ai_search(self):
+
+        if self.search_thread is None:
+            self.tictactoe.clear_cancel()
+            self.search_thread = threading.Thread(target=self.run_ai_search, daemon=True)
+            self.search_thread.start()
+            return
+
+        if self.search_thread.is_alive():
+            return
+
+        self.search_thread = None
+        self.tictactoe.play_action(self.search_queue.get())
+
+    # the work of the background thread
+    def run_ai_search(self):
+        self.search_queue.put(self.tictactoe.decision_tree())
+
+    # cancel the AI search and throw away its move, the search is started
+    # again in the next frame if it is still the AI's turn
+    def stop_ai_search(self):
+
+        if self.search_thread is None:
+            return
+
+        self.tictactoe.cancel_search()
+        self.search_thread.join()
+        self.search_thread = None
+
+        while not self.search_queue.empty():
+            self.search_queue.get()
+
     # classify the action from the mouse click and act accordingly
     def handle_mouse_click(self, mousex, mousey):
 
         # if the mouse click is in the gameboard
         if mousey < GRIDSIZE:
-            if mousex<GRIDSIZE:
-                clicked_grid_i = int(mousex / 100)
-                clicked_grid_j = int(mousey / 100)
+            if mousex < self.cols*self.tile_size and mousey < self.rows*self.tile_size:
+                clicked_grid_i = int(mousex / self.tile_size)
+                clicked_grid_j = int(mousey / self.tile_size)
 
-                # check if the click is valid, if so, add the step and update the game board
-                if self.tictactoe.end_game == False and self.tictactoe.grid[clicked_grid_j][clicked_grid_i] == 0:
+                # check if the click is valid, if so, add the step and update the game board.
+                # The clicks during the turn of the AI are ignored
+                if self.tictactoe.end_game == False and self.tictactoe.player == 0 and self.tictactoe.grid[clicked_grid_j][clicked_grid_i] == 0:
                     self.tictactoe.add_move((clicked_grid_j, clicked_grid_i))
 
                     # need to check if the finishes after the player's move
@@ -394,12 +1044,13 @@ class TicTacToeApp():
         # if the mouse click one of the buttons
         elif mousey>GRIDSIZE and mousey<GRIDSIZE + BUTTONSIZE[1]:
             if mousex < BUTTONSIZE[0]:
-                self.tictactoe.set_decision_level(1)
-                print("Difficult reduced to 1")
+                self.tictactoe.set_decision_level(self.tictactoe.levels[0])
+                logger.info("Difficult set to {}".format(self.tictactoe.levels[0]))
             elif mousex > BUTTONSIZE[0] and mousex < 2*BUTTONSIZE[0]: 
-                self.tictactoe.set_decision_level(3)
-                print("Difficult reduced to 3")
+                self.tictactoe.set_decision_level(self.tictactoe.levels[1])
+                logger.info("Difficult set to {}".format(self.tictactoe.levels[1]))
             elif mousex > 2*BUTTONSIZE[0] and mousex < 3*BUTTONSIZE[0]:
+                self.stop_ai_search()
                 self.tictactoe.reset_game()
 
     # draw the game board and all the button for the GUI
@@ -408,28 +1059,36 @@ class TicTacToeApp():
         self.display_surf.fill(BGCOLOR)
 
         # draw the board
-        grid_rect = pygame.Rect(0, 0, GRIDSIZE, GRIDSIZE)
-        self.display_surf.blit(GRIDIMG, grid_rect)
+        if self.solved:
+            grid_rect = pygame.Rect(0, 0, GRIDSIZE, GRIDSIZE)
+            self.display_surf.blit(self.get_image("grid"), grid_rect)
+        else:
+            width = self.cols * self.tile_size
+            height = self.rows * self.tile_size
+            for i in range(1, self.cols):
+                pygame.draw.line(self.display_surf, LINECOLOR, (i*self.tile_size, 0), (i*self.tile_size, height))
+            for j in range(1, self.rows):
+                pygame.draw.line(self.display_surf, LINECOLOR, (0, j*self.tile_size), (width, j*self.tile_size))
 
         # draw all the chess
-        for j in range(3):
-            for i in range(3):
+        for j in range(self.rows):
+            for i in range(self.cols):
                 if self.tictactoe.grid[j][i] == 1:
-                    grid_rect = pygame.Rect(MARGINSIZE + i*TILESIZE, MARGINSIZE + j*TILESIZE, IMGSIZE[0], IMGSIZE[1])
-                    self.display_surf.blit(CIRCLEIMG, grid_rect)
+                    grid_rect = pygame.Rect(self.margin + i*self.tile_size, self.margin + j*self.tile_size, IMGSIZE[0], IMGSIZE[1])
+                    self.display_surf.blit(self.circle_img, grid_rect)
                 elif self.tictactoe.grid[j][i] == -1:
-                    grid_rect = pygame.Rect(MARGINSIZE + i*TILESIZE, MARGINSIZE + j*TILESIZE, IMGSIZE[0], IMGSIZE[1])
-                    self.display_surf.blit(CROSSIMG, grid_rect)
+                    grid_rect = pygame.Rect(self.margin + i*self.tile_size, self.margin + j*self.tile_size, IMGSIZE[0], IMGSIZE[1])
+                    self.display_surf.blit(self.cross_img, grid_rect)
 
         # draw all the buttons
         grid_rect = pygame.Rect(10, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(EASYBTN, grid_rect)
+        self.display_surf.blit(self.get_image("easy"), grid_rect)
 
         grid_rect = pygame.Rect(110, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(HARDBTN, grid_rect)
+        self.display_surf.blit(self.get_image("hard"), grid_rect)
 
         grid_rect = pygame.Rect(210, GRIDSIZE+10, BUTTONSIZE[0], BUTTONSIZE[1])
-        self.display_surf.blit(RESETBTN, grid_rect)
+        self.display_surf.blit(self.get_image("reset"), grid_rect)
 
         # draw the score
         score_text = "Win: {} Lose: {} Draw: {}".format(self.tictactoe.result[0], self.tictactoe.result[1], self.tictactoe.result[2])
@@ -437,6 +1096,12 @@ class TicTacToeApp():
         self.display_surf.blit(grid_surf, grid_rect)
         #print(grid_rect.x)
 
+    # the image cache of the app, each image is loaded the first time it is used
+    def get_image(self, name):
+        if name not in self.images:
+            self.images[name] = pygame.image.load(IMAGEFILES[name])
+        return self.images[name]
+
     # a short method to trasnfer text into sprites
     def make_text(self, text, color, bgcolor, left, top):
         text_surf = self.basic_font.render(text, True, color, bgcolor)
@@ -448,21 +1113,20 @@ class TicTacToeApp():
 # automatically. The backend is called inside the frontend
 def main():
 
-    tictaetoe_app = TicTacToeApp()
+    parser = argparse.ArgumentParser(description="Tic-tac-toe and m,n,k-games against the AI")
+    parser.add_argument("--rows", type=int, default=3, help="number of rows of the board")
+    parser.add_argument("--cols", type=int, default=3, help="number of columns of the board")
+    parser.add_argument("--k", type=int, default=3, help="number of chess in a row to win")
+    args = parser.parse_args()
 
-    '''
-    tictactoe = Tictactoe()
+    if args.k > max(args.rows, args.cols):
+        parser.error("k cannot be larger than the board")
 
-    for i in range(9):
-        tictactoe.player_step()
-        if tictactoe.player == 0:
-            tictactoe.decision_level = 3
-        else:
-            tictactoe.decision_level = 1
-        if tictactoe.end_game == True:
-            print("End game: {}".format(tictactoe.grid))
-            break
-    '''
+    # show the debug output of the game on the console
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+
+    # the AI against the AI without the app is run by tictactoe_tournament.py
+    tictaetoe_app = TicTacToeApp(args.rows, args.cols, args.k)
 
 
 if __name__=="__main__":
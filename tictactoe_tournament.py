@@ -0,0 +1,180 @@
+'''
+This is a headless tournament for the AI of the tic-tac-toe game in
+tictactoe.py. It plays a number of games between every pair of decision
+levels without opening any window, spreads the games over worker processes,
+and reports the results of every pair, the moves per second and the latency
+of the moves. The report is written as JSON so that runs can be compared.
+
+Example:
+    python tictactoe_tournament.py --levels 1,3,9 --games 2000 --workers 4 --output run.json
+'''
+
+import os
+
+# the tournament never opens a window, and pygame (imported by tictactoe.py)
+# should not look for a display nor print its banner in every worker
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import time
+
+from tictactoe import Tictactoe, CACHE, CACHEFILE
+
+# games of a pair are split into tasks of this many games for the workers
+TASKGAMES = 100
+
+# the p-th percentile of a list of numbers, by the nearest rank
+def percentile(values, p):
+    if values == []:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(p / 100.0 * len(ordered))))
+    return ordered[rank-1]
+
+# load the solve cache file once in every worker process
+def init_worker(cache_file):
+    if cache_file is not None and os.path.exists(cache_file):
+        CACHE.load(cache_file)
+
+# play one task of games between two levels in a worker. The levels take
+# turns to move first, game "index" is started by level 1 if it is even.
+# Return the wins of level 1, the wins of level 2, the draws and the
+# latency of every move of both levels
+def play_games(task):
+
+    levels, first_index, games, seed = task
+    random.seed(seed)
+
+    result = [0, 0, 0]
+    latency = [[], []]
+
+    for index in range(first_index, first_index + games):
+
+        first = index % 2
+        game = Tictactoe()
+        game.player = 0
+
+        while game.end_game == False:
+            side = (first + game.player) % 2
+            game.set_decision_level(levels[side])
+
+            start = time.perf_counter()
+            game.player_step()
+            latency[side].append(time.perf_counter() - start)
+
+        if game.winner is None:
+            result[2] += 1
+        else:
+            result[(first + game.winner) % 2] += 1
+
+    return levels, result, latency
+
+# play all the pairs of levels in the worker processes
+def run_tournament(levels, games, workers, seed=None, cache_file=None):
+
+    pairs = [(levels[a], levels[b]) for a in range(len(levels)) for b in range(a, len(levels))]
+
+    # every task has its own seed so that a run can be repeated
+    seeds = random.Random(seed)
+    tasks = []
+    for pair in pairs:
+        for first_index in range(0, games, TASKGAMES):
+            tasks.append((pair, first_index, min(TASKGAMES, games - first_index), seeds.getrandbits(32)))
+
+    results = {pair: [0, 0, 0] for pair in pairs}
+    latency = {pair: [[], []] for pair in pairs}
+
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.Pool(workers, init_worker, (cache_file,)) as pool:
+            outputs = pool.map(play_games, tasks)
+    else:
+        init_worker(cache_file)
+        outputs = [play_games(task) for task in tasks]
+    wall_time = time.perf_counter() - start
+
+    for pair, result, task_latency in outputs:
+        for n in range(3):
+            results[pair][n] += result[n]
+        for side in range(2):
+            latency[pair][side].extend(task_latency[side])
+
+    return report(pairs, results, latency, games, workers, wall_time)
+
+# summary of the run as a dictionary ready for JSON
+def report(pairs, results, latency, games, workers, wall_time):
+
+    matches = []
+    moves = 0
+    for pair in pairs:
+        result = results[pair]
+        sides = []
+        for side in range(2):
+            values = latency[pair][side]
+            moves += len(values)
+            sides.append({
+                "level": pair[side],
+                "moves": len(values),
+                "win_rate": result[side] / games if games > 0 else 0.0,
+                "avg_latency": sum(values) / len(values) if values != [] else 0.0,
+                "p95_latency": percentile(values, 95),
+                "max_latency": max(values) if values != [] else 0.0,
+            })
+        matches.append({
+            "levels": list(pair),
+            "games": games,
+            "wins": result[:2],
+            "draws": result[2],
+            "draw_rate": result[2] / games if games > 0 else 0.0,
+            "sides": sides,
+        })
+
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "games_per_pair": games,
+        "workers": workers,
+        "wall_time": wall_time,
+        "moves": moves,
+        "moves_per_second": moves / wall_time if wall_time > 0 else 0.0,
+        "matches": matches,
+    }
+
+# print the main numbers of the report
+def print_report(report):
+
+    print("{} moves in {:.2f}s with {} workers, {:.0f} moves/s".format(
+        report["moves"], report["wall_time"], report["workers"], report["moves_per_second"]))
+    for match in report["matches"]:
+        first, second = match["sides"]
+        print("Level {} vs level {}: wins {} - {}, draws {} ({:.1%})".format(
+            first["level"], second["level"], match["wins"][0], match["wins"][1], match["draws"], match["draw_rate"]))
+        for side in match["sides"]:
+            print("    level {}: {} moves, latency avg {:.6f}s p95 {:.6f}s max {:.6f}s".format(
+                side["level"], side["moves"], side["avg_latency"], side["p95_latency"], side["max_latency"]))
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Headless tournament between the tic-tac-toe AI levels")
+    parser.add_argument("--levels", default="1,3,9", help="decision levels to pair up, every pair plays including a level against itself")
+    parser.add_argument("--games", type=int, default=1000, help="number of games of every pair")
+    parser.add_argument("--workers", type=int, default=max(1, multiprocessing.cpu_count() - 1), help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random choices between equal moves")
+    parser.add_argument("--cache", default=CACHEFILE, help="solve cache file loaded by the workers if it exists")
+    parser.add_argument("--output", default=None, help="JSON file for the report")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report = run_tournament(levels, args.games, args.workers, args.seed, args.cache)
+
+    print_report(report)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()